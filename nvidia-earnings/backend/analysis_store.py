@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.getenv("ANALYSIS_DB", "analysis_cache.db")
+# How long a worker may hold a symbol's build lease without renewing it
+LEASE_SECONDS = float(os.getenv("ANALYSIS_LEASE_SECONDS", "900"))
+# Read analyses through a memory map of the database file, shared by every worker
+MMAP_BYTES = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    symbol TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    built_at REAL NOT NULL,
+    analysis TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS theme_indexes (
+    symbol TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    symbol TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+def write_json_atomic(path, data):
+    """Write JSON to a temporary file and rename it over path, so readers never see a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class AnalysisStore:
+    """Analyses shared by every worker process, versioned per symbol, with build leases.
+
+    Each save bumps the symbol's version, so workers notice a new analysis with one
+    indexed lookup and only then parse it. A lease names the single worker allowed
+    to rebuild a symbol; it expires if that worker dies mid-build.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        # Identifies this store instance (and so this process) as a lease owner
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        with self._connect() as conn:
+            # WAL lets workers keep reading while another one saves
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def version(self, symbol):
+        """(version, built_at) of the stored analysis, or None"""
+        with self._connect() as conn:
+            return conn.execute("SELECT version, built_at FROM analyses WHERE symbol = ?", (symbol,)).fetchone()
+
+    def load(self, symbol):
+        """(version, built_at, analysis) of the stored analysis, or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT version, built_at, analysis FROM analyses WHERE symbol = ?", (symbol,)
+            ).fetchone()
+        if not row:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def save(self, symbol, analysis, built_at):
+        """Store a new analysis; returns its version"""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO analyses (symbol, version, built_at, analysis) VALUES (?, 1, ?, ?)
+                ON CONFLICT(symbol) DO UPDATE SET
+                    version = analyses.version + 1,
+                    built_at = excluded.built_at,
+                    analysis = excluded.analysis
+                """,
+                (symbol, built_at, json.dumps(analysis, separators=(",", ":")))
+            )
+            version = conn.execute("SELECT version FROM analyses WHERE symbol = ?", (symbol,)).fetchone()[0]
+        logger.info(f"Stored {symbol} analysis version {version}")
+        return version
+
+    def import_file(self, symbol, path):
+        """Seed the store from a JSON cache file written by an older version, unless it has the symbol"""
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            analysis = json.load(f)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO analyses (symbol, version, built_at, analysis) VALUES (?, 1, ?, ?) ON CONFLICT(symbol) DO NOTHING",
+                (symbol, os.path.getmtime(path), json.dumps(analysis, separators=(",", ":")))
+            )
+
+    def load_themes(self, symbol):
+        """The symbol's stored theme index (see theme_index.ThemeIndex.to_dict), or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM theme_indexes WHERE symbol = ?", (symbol,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_themes(self, symbol, data):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO theme_indexes (symbol, data) VALUES (?, ?) ON CONFLICT(symbol) DO UPDATE SET data = excluded.data",
+                (symbol, json.dumps(data, separators=(",", ":")))
+            )
+
+    def acquire_lease(self, symbol, seconds=LEASE_SECONDS):
+        """Take or renew the symbol's build lease; False while another live worker holds it"""
+        now = time.time()
+        with self._connect() as conn:
+            # A single statement, so two workers can never both see the lease as free
+            cursor = conn.execute(
+                """
+                INSERT INTO leases (symbol, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(symbol) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE leases.owner = excluded.owner OR leases.expires_at < ?
+                """,
+                (symbol, self.owner, now + seconds, now)
+            )
+            return cursor.rowcount == 1
+
+    def release_lease(self, symbol):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE symbol = ? AND owner = ?", (symbol, self.owner))
+
+    def lease_held(self, symbol):
+        """Whether a live lease (held by anyone) exists for the symbol"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT expires_at FROM leases WHERE symbol = ?", (symbol,)).fetchone()
+        return row is not None and row[0] >= time.time()
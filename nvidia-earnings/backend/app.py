@@ -1,12 +1,24 @@
-from fastapi import FastAPI, HTTPException
+import time
+# Taken before any other import, so the cold start report covers all of them
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import os
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import hashlib
+import hmac
 import json
+import os
 import logging
+import re
 import traceback
-import time  # Essential for cache freshness
-from nlp_analyzer import analyze_transcripts, test_api_connection
-from transcript_fetcher import get_transcripts
+from contextlib import asynccontextmanager
+import metrics
+from nlp_analyzer import test_api_connection
+from transcript_fetcher import DEFAULT_SYMBOL, get_store, get_transcripts
+from transcript_store import SEARCH_ORDERS
+from refresh_coordinator import FIELDS, SUMMARY_FIELDS, EncodedBody, NoTranscriptsError, project
+from scheduler import RefreshScheduler
 
 # Configure logging
 logging.basicConfig(
@@ -15,7 +27,41 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Rebuild analyses older than this many seconds even before they expire (0 waits for the TTL)
+REFRESH_INTERVAL = int(os.getenv("ANALYSIS_REFRESH_INTERVAL", "0"))
+# Required by /api/admin/refresh, which stays closed while it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Symbols kept fresh from startup; any other valid symbol is tracked while it keeps being requested
+SYMBOLS = [s.strip().upper() for s in os.getenv("ANALYSIS_SYMBOLS", DEFAULT_SYMBOL).split(",") if s.strip()]
+SYMBOL_RE = re.compile(r"^[A-Z][A-Z.\-]{0,9}$")
+QUARTER_RE = re.compile(r"^Q([1-4])[\s_-]*(\d{4})$", re.IGNORECASE)
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Import plus prewarm time above which a worker's cold start is reported as too slow
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.5"))
+
+scheduler = RefreshScheduler(SYMBOLS, max_age=REFRESH_INTERVAL or None)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the last good analyses now, so even the first request is served from memory
+    prewarm_started = time.perf_counter()
+    scheduler.prewarm()
+    report_startup(time.perf_counter() - prewarm_started)
+    scheduler.start()
+    yield
+    scheduler.stop()
+
+def report_startup(prewarm_seconds):
+    metrics.STARTUP_SECONDS.set(round(IMPORT_SECONDS, 4), phase="import")
+    metrics.STARTUP_SECONDS.set(round(prewarm_seconds, 4), phase="prewarm")
+    total = IMPORT_SECONDS + prewarm_seconds
+    message = f"Worker ready in {total:.3f}s (imports {IMPORT_SECONDS:.3f}s, prewarm {prewarm_seconds:.3f}s)"
+    if total > STARTUP_BUDGET_SECONDS:
+        logger.warning(f"{message}, over the {STARTUP_BUDGET_SECONDS}s startup budget")
+    else:
+        logger.info(message)
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS settings
 app.add_middleware(
@@ -23,6 +69,7 @@ app.add_middleware(
     allow_origins=["*"],  # Allows all origins
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["ETag", "X-Trace-Id", "Content-Range", "Accept-Ranges"],
 )
 
 @app.get("/")
@@ -30,53 +77,178 @@ def root():
     return {
         "status": "API is working", 
         "endpoints": {
-            "/api/analysis": "Get analysis of recent NVIDIA earnings call transcripts",
+            "/api/analysis": "Get analysis of recent NVIDIA earnings call transcripts (?fields=... to pick result fields, content for transcript text)",
+            "/api/analysis/stream": "Stream the analysis as NDJSON, one event per finished quarter",
+            "/api/analysis/{quarter}": "Get one quarter's analysis, e.g. /api/analysis/Q1-2025",
+            "/api/analysis/{quarter}/transcript": "Get one quarter's transcript text (supports Range requests)",
+            "/api/analysis/{symbol}": "Get analysis of another ticker's earnings call transcripts",
+            "/api/analysis/{symbol}/stream": "Stream another ticker's analysis as NDJSON",
+            "/api/analysis/{symbol}/{quarter}": "Get one quarter of another ticker's analysis",
+            "/api/analysis/{symbol}/{quarter}/transcript": "Get one quarter of another ticker's transcript text",
+            "/api/themes": "Canonical themes across quarters, with per-quarter mention counts and sentiment",
+            "/api/themes/{symbol}": "Theme trends of another ticker",
+            "/api/search": "Search stored transcripts by speaker turn (?q=blackwell, q=\"sovereign AI\", order=oldest for first mentions)",
             "/api/test": "Test DeepSeek API connection",
+            "/api/admin/refresh": "Trigger a background rebuild of the analysis (POST)",
+            "/metrics": "Prometheus metrics: per-stage latency, cache hits, LLM retries and tokens",
+            "/metrics/traces": "Per-stage timings of recent analysis builds",
             "/test-scraper": "Test transcript scraper"
         }
     }
 
+def refresher_for(symbol):
+    symbol = symbol.upper()
+    if not SYMBOL_RE.match(symbol):
+        raise HTTPException(status_code=400, detail=f"Invalid symbol: {symbol}")
+    scheduler.record_request(symbol)
+    return scheduler.refresher(symbol)
+
 @app.get("/api/analysis")
-def get_analysis():
+def get_analysis(request: Request, fields: str = None):
+    return analysis_response(DEFAULT_SYMBOL, request, fields)
+
+@app.get("/api/analysis/stream")
+def stream_analysis():
+    return analysis_stream(DEFAULT_SYMBOL)
+
+@app.get("/api/analysis/{symbol}/stream")
+def stream_symbol_analysis(symbol: str):
+    return analysis_stream(symbol)
+
+@app.get("/api/analysis/{quarter}/transcript")
+def get_transcript(quarter: str, request: Request):
+    return transcript_response(DEFAULT_SYMBOL, quarter, request)
+
+@app.get("/api/analysis/{symbol}/{quarter}/transcript")
+def get_symbol_transcript(symbol: str, quarter: str, request: Request):
+    return transcript_response(symbol, quarter, request)
+
+@app.get("/api/analysis/{symbol}/{quarter}")
+def get_symbol_quarter(symbol: str, quarter: str, request: Request, fields: str = None):
+    return quarter_response(symbol, quarter, request, fields)
+
+@app.get("/api/analysis/{symbol}")
+def get_symbol_analysis(symbol: str, request: Request, fields: str = None):
+    # Symbols never contain digits, so /api/analysis/Q1-2025 can only name a quarter
+    if parse_quarter(symbol):
+        return quarter_response(DEFAULT_SYMBOL, symbol, request, fields)
+    return analysis_response(symbol, request, fields)
+
+@app.get("/api/themes")
+def get_themes(request: Request):
+    return themes_response(DEFAULT_SYMBOL, request)
+
+@app.get("/api/themes/{symbol}")
+def get_symbol_themes(symbol: str, request: Request):
+    return themes_response(symbol, request)
+
+def parse_fields(fields):
+    """Requested result fields; transcript text is only included when named"""
+    if fields is None:
+        return None
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in FIELDS]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}; choose from {list(FIELDS)}")
+    return selected
+
+def parse_quarter(quarter):
+    """Normalize "Q1 2025", "q1-2025" or "Q1_2025" to "Q1 2025"; None if it is not a quarter"""
+    match = QUARTER_RE.match(quarter.strip())
+    return f"Q{match.group(1)} {match.group(2)}" if match else None
+
+def find_quarter(snapshot, quarter):
+    index = snapshot.find(parse_quarter(quarter) or quarter)
+    if index is None:
+        raise HTTPException(status_code=404, detail=f"No analysis for quarter: {quarter}")
+    return index
+
+def analysis_response(symbol, request, fields=None):
+    fields = parse_fields(fields)
+
+    def render(snapshot):
+        return encoded_response(request, snapshot, snapshot.summary if fields is None else EncodedBody(snapshot.select(fields)))
+
+    return snapshot_response(symbol, request, render)
+
+def themes_response(symbol, request):
+    # Precomputed with each analysis, so this is served like the summary
+    return snapshot_response(symbol, request, lambda snapshot: encoded_response(request, snapshot, snapshot.themes))
+
+def quarter_response(symbol, quarter, request, fields=None):
+    fields = parse_fields(fields) or SUMMARY_FIELDS
+
+    def render(snapshot):
+        result = project(snapshot.analysis[find_quarter(snapshot, quarter)], fields)
+        return encoded_response(request, snapshot, EncodedBody(result))
+
+    return snapshot_response(symbol, request, render)
+
+def transcript_response(symbol, quarter, request):
+    def render(snapshot):
+        body = snapshot.transcripts[find_quarter(snapshot, quarter)]
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "no-cache"}
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+
+        byte_range = parse_range(request.headers.get("range"), len(body))
+        # A Range for an older version of the transcript gets the whole current one
+        if byte_range is None or request.headers.get("if-range", etag) != etag:
+            return Response(content=body, media_type="text/plain; charset=utf-8", headers=headers)
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+        return Response(content=body[start:end + 1], status_code=206, media_type="text/plain; charset=utf-8", headers=headers)
+
+    return snapshot_response(symbol, request, render)
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single "bytes=" range, None to send the whole body"""
+    match = RANGE_RE.match(header or "")
+    if not match:
+        # Absent, multi-range or non-byte ranges: serving the full body is always allowed
+        return None
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    elif last:
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def encoded_response(request, snapshot, encoded):
+    headers = {
+        "ETag": encoded.etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if snapshot.trace_id:
+        headers["X-Trace-Id"] = snapshot.trace_id
+    if encoded.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    body, encoding = encoded.encode_for(request.headers.get("accept-encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def snapshot_response(symbol, request, render):
     try:
-        logger.info("⚡️ /api/analysis called")
-        cache_file = "analysis_cache.json"
-        
-        # Check cache freshness (update daily)
-        use_cache = False
-        if os.path.exists(cache_file):
-            cache_age = os.path.getmtime(cache_file)
-            current_time = time.time()
-            if (current_time - cache_age) < 86400:  # 24 hours in seconds
-                use_cache = True
-                logger.info("Using cached analysis (less than 24 hours old)")
-
-        if use_cache:
-            logger.info("Loading analysis from cache")
-            with open(cache_file, "r") as f:
-                return json.load(f)
-
-        # Fetch and analyze transcripts
-        logger.info("Fetching fresh transcripts...")
-        transcripts = get_transcripts()
-        logger.info(f"Fetched {len(transcripts)} transcripts")
-        
-        if not transcripts:
-            raise HTTPException(
-                status_code=404,
-                detail="No transcripts found"
-            )
-
-        logger.info("Analyzing transcripts...")
-        analysis = analyze_transcripts(transcripts)
-
-        # Cache result
-        logger.info("Saving analysis to cache")
-        with open(cache_file, "w") as f:
-            json.dump(analysis, f, indent=2)
-
-        return analysis
+        logger.info(f"⚡️ {request.url.path} called for {symbol}")
+        # Serves the last good analysis; only the very first build is waited on,
+        # and concurrent callers share that single in-flight build
+        # X-Trace-Id names the trace of a build this request has to wait for
+        snapshot = refresher_for(symbol).get_snapshot(trace_id=request.headers.get("x-trace-id"))
+        return render(snapshot)
 
+    except NoTranscriptsError as e:
+        raise HTTPException(
+            status_code=404,
+            detail=str(e)
+        )
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -90,13 +262,81 @@ def get_analysis():
             }
         )
 
+def analysis_stream(symbol):
+    logger.info(f"⚡️ /api/analysis/stream called for {symbol}")
+    refresher = refresher_for(symbol)
+
+    # One JSON event per line: start, quarter (as each finishes), then done with tone changes
+    def ndjson():
+        try:
+            for event in refresher.stream():
+                yield json.dumps(event, separators=(",", ":")) + "\n"
+        except Exception as e:
+            logger.error("Error in stream_analysis")
+            logger.error(traceback.format_exc())
+            yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/admin/refresh")
+def admin_refresh(symbol: str = DEFAULT_SYMBOL, x_admin_token: str = Header(None), x_trace_id: str = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled: ADMIN_TOKEN is not set")
+    if not hmac.compare_digest((x_admin_token or "").encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    refresher = refresher_for(symbol)
+    refresher.refresh(trace_id=x_trace_id)
+    return {"status": "refresh started", "symbol": symbol.upper(), "trace_id": refresher.trace_id}
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/traces")
+def get_traces():
+    return metrics.recent_traces()
+
+@app.get("/metrics/traces/{trace_id}")
+def get_trace(trace_id: str):
+    found = metrics.get_trace(trace_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown trace: {trace_id}")
+    return found
+
+@app.get("/api/search")
+def search_transcripts(q: str, symbol: str = None, section: str = None, order: str = "relevance", limit: int = 20):
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty query")
+    if order not in SEARCH_ORDERS:
+        raise HTTPException(status_code=400, detail=f"Unknown order: {order}; choose from {list(SEARCH_ORDERS)}")
+    if section not in (None, "management", "qa"):
+        raise HTTPException(status_code=400, detail=f"Unknown section: {section}")
+    store = get_store()
+    if not store.searchable:
+        raise HTTPException(status_code=503, detail="Transcript search is not available on this server")
+
+    started = time.perf_counter()
+    hits = store.search(q, symbol=symbol.upper() if symbol else None, section=section, order=order, limit=max(1, min(limit, 100)))
+    return {
+        "query": q,
+        "hits": hits,
+        "took_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
 @app.get("/api/test")
 def test_api():
     return {"result": test_api_connection()}
 
 @app.get("/test-scraper")
-def test_scraper():
-    return get_transcripts()
+def test_scraper(symbol: str = DEFAULT_SYMBOL):
+    return get_transcripts(symbol.upper())
+
+# Everything above runs on import, in every worker
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
 
 # This ensures the app can be run directly with Python
 if __name__ == "__main__":
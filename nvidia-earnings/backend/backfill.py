@@ -0,0 +1,186 @@
+"""Backfill analysis for saved transcript pages.
+
+Run from the backend directory:
+
+    python backfill.py saved_pages/ --output history.jsonl
+    python backfill.py manifest.jsonl --ticker NVDA --workers 8
+
+INPUT is a directory of .html files or a manifest with one entry per line,
+either a bare path or {"path": ..., "url": ..., "ticker": ...}. Pages are parsed
+in a process pool and analyzed under the usual LLM scheduler. Each analysis is
+appended to the JSONL output as soon as it finishes, and pages already in the
+output (matched by content hash) are skipped, so an interrupted run resumes
+where it stopped. Tone changes are then recomputed over the whole ordered
+history and written next to the output as CSV.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from nlp_analyzer import analyze_transcripts, tone_scores
+from transcript_fetcher import company_name, parse_transcript_page
+from transcript_store import content_hash
+
+logger = logging.getLogger(__name__)
+
+def read_manifest(source, ticker):
+    """Entries of {"path", "url", "ticker"} from a directory or a manifest file"""
+    if os.path.isdir(source):
+        return [
+            {"path": os.path.join(source, name), "url": name, "ticker": ticker}
+            for name in sorted(os.listdir(source)) if name.endswith((".html", ".htm"))
+        ]
+
+    entries = []
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line) if line.startswith("{") else {"path": line}
+            entry["path"] = os.path.join(base, entry["path"])
+            entry.setdefault("url", os.path.basename(entry["path"]))
+            entry.setdefault("ticker", ticker)
+            entries.append(entry)
+    return entries
+
+def read_history(output):
+    """The complete records in the output, skipping lines that do not parse"""
+    records = []
+    with open(output) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A run killed mid-write can leave a truncated last line
+                logger.warning(f"Skipping unreadable line in {output}: {line[:80]!r}")
+    return records
+
+def load_done(output):
+    """Content hashes already present in the output"""
+    if not os.path.exists(output):
+        return set()
+    return {record["content_hash"] for record in read_history(output) if "content_hash" in record}
+
+def drop_partial_line(output):
+    """Truncate the output after its last newline, so appends never join a half-written line"""
+    if not os.path.exists(output):
+        return
+    with open(output, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b"\n")
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position < end:
+            logger.warning(f"Dropping {end - position} bytes of a truncated last line from {output}")
+            f.truncate(position)
+
+def parse_entry(entry):
+    """Process-pool worker: parse one saved page into a transcript record"""
+    with open(entry["path"], "rb") as f:
+        html = f.read()
+    record = parse_transcript_page(html, entry["url"])
+    record.update(ticker=entry["ticker"], source=entry["path"], content_hash=content_hash(html))
+    return record
+
+def parse_all(entries, workers):
+    records = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(parse_entry, entry): entry for entry in entries}
+        for future in as_completed(futures):
+            try:
+                records.append(future.result())
+            except Exception as e:
+                # Left out of the output, so the next run retries it
+                logger.error(f"Failed to parse {futures[future]['path']}: {e}")
+    return records
+
+def quarter_key(record):
+    """Chronological sort key from a "Q3 2024" style quarter, then the date string"""
+    match = re.match(r"Q([1-4])\s+(\d{4})", record.get("quarter", ""))
+    year, quarter = (int(match.group(2)), int(match.group(1))) if match else (0, 0)
+    return record.get("ticker", ""), year, quarter, record.get("date", "")
+
+def write_tone_history(output, path):
+    """Recompute tone changes over each ticker's full ordered history in one vectorized pass"""
+    history = sorted(read_history(output), key=quarter_key)
+
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ticker", "quarter", "date", "tone", "tone_change"])
+        for ticker in sorted({r["ticker"] for r in history}):
+            records = [r for r in history if r["ticker"] == ticker]
+            scores = tone_scores(records)
+            changes = [None] + [round(float(c), 2) for c in scores[1:] - scores[:-1]]
+            for record, score, change in zip(records, scores, changes):
+                writer.writerow([ticker, record["quarter"], record["date"], round(float(score), 3), change])
+    logger.info(f"Wrote tone history for {len(history)} transcripts to {path}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill transcript analysis from saved HTML pages")
+    parser.add_argument("input", help="directory of .html files or a manifest file")
+    parser.add_argument("--output", default="history.jsonl", help="append-only JSONL store (default: history.jsonl)")
+    parser.add_argument("--ticker", default="NVDA", help="ticker for entries that do not name one")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parser processes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    entries = read_manifest(args.input, args.ticker)
+    done = load_done(args.output)
+    pending = []
+    for entry in entries:
+        with open(entry["path"], "rb") as f:
+            if content_hash(f.read()) not in done:
+                pending.append(entry)
+    logger.info(f"{len(entries)} pages, {len(entries) - len(pending)} already analyzed, {len(pending)} to go")
+
+    records = parse_all(pending, args.workers)
+    if records:
+        write_lock = threading.Lock()
+        drop_partial_line(args.output)
+        with open(args.output, "a") as out:
+            def append(record, result):
+                row = {
+                    "ticker": record["ticker"],
+                    "source": record["source"],
+                    "content_hash": record["content_hash"],
+                    "quarter": result["quarter"],
+                    "date": result["date"],
+                    "management": result["management"],
+                    "qa": result["qa"],
+                }
+                with write_lock:
+                    out.write(json.dumps(row, separators=(",", ":")) + "\n")
+                    out.flush()
+
+            # Prompts name the company, so each ticker is analyzed as its own batch
+            for ticker in sorted({record["ticker"] for record in records}):
+                batch = [record for record in records if record["ticker"] == ticker]
+                analyze_transcripts(
+                    batch,
+                    on_result=lambda index, result, batch=batch: append(batch[index], result),
+                    company=company_name(ticker)
+                )
+
+    if os.path.exists(args.output):
+        write_tone_history(args.output, os.path.splitext(args.output)[0] + "_tone.csv")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
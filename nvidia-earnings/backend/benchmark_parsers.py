@@ -0,0 +1,65 @@
+"""Compare HTML parser engines on the saved debug pages.
+
+Run from the backend directory: python benchmark_parsers.py [repeats]
+Every engine must extract the same records as the html.parser fallback.
+"""
+import logging
+import sys
+import time
+
+from html_parsing import FALLBACK_ENGINE, available_engines
+from transcript_fetcher import build_transcript_record
+
+LISTING_PAGES = ["debug/NVDA_transcript_list.html"]
+TRANSCRIPT_PAGES = [
+    "debug/transcript_page.html",
+    "debug_transcript_1.html",
+    "debug_transcript_2.html",
+    "debug_transcript_3.html",
+    "debug_page.html",
+]
+# Stand-in URL: quarter detection may fall back to it, so it must be the same for every engine
+PAGE_URL = "https://www.fool.com/earnings/call-transcripts/nvda/"
+
+def extract_all(engine, pages):
+    # Engines are called directly so a silent html.parser fallback cannot hide a mismatch
+    listings = [engine.listing_links(pages[path]) for path in LISTING_PAGES]
+    parts = [engine.transcript_parts(pages[path]) for path in TRANSCRIPT_PAGES]
+    return listings, parts
+
+def records(extracted):
+    """The transcript records fetch_transcripts would store for the extracted parts"""
+    _, parts = extracted
+    return [build_transcript_record(page_parts, PAGE_URL) for page_parts in parts]
+
+def timed(engine, pages, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        extracted = extract_all(engine, pages)
+        best = min(best, time.perf_counter() - start)
+    return best, extracted
+
+def main(repeats=3):
+    logging.disable(logging.WARNING)
+    pages = {}
+    for path in LISTING_PAGES + TRANSCRIPT_PAGES:
+        with open(path, "rb") as f:
+            pages[path] = f.read()
+
+    baseline_time, expected = timed(FALLBACK_ENGINE, pages, repeats)
+    print(f"{FALLBACK_ENGINE.name:<12} {baseline_time * 1000:8.1f} ms  (reference)")
+
+    ok = True
+    for engine in available_engines():
+        if engine is FALLBACK_ENGINE:
+            continue
+        elapsed, extracted = timed(engine, pages, repeats)
+        same = extracted == expected and records(extracted) == records(expected)
+        ok = ok and same
+        print(f"{engine.name:<12} {elapsed * 1000:8.1f} ms  {baseline_time / elapsed:5.1f}x  "
+              f"{'records match' if same else 'RECORDS DIFFER'}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3))
@@ -0,0 +1,249 @@
+"""Offline benchmarks for the scraping, analysis and serving paths, against local stand-ins.
+
+Run from the backend directory:
+
+    python benchmark_suite.py --save-baseline             # record this machine's baseline
+    python benchmark_suite.py                             # compare against it
+    python benchmark_suite.py --suite load --llm-latency 0.2 --error-rate 0.1
+
+Nothing leaves the machine: fool.com and the DeepSeek API are replaced by stand_ins.py,
+the tokenizer encoding is only read from TIKTOKEN_CACHE_DIR (see chunking.py), and every
+SQLite store lives in a temporary directory. Exits with 1 when a benchmark's
+p50 is more than --threshold slower than the baseline.
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import stand_ins
+
+SUITES = ("micro", "e2e", "load", "startup")
+DEFAULT_BASELINE = "benchmark_baseline.json"
+# A benchmark regresses when its p50 is this much slower than the baseline
+DEFAULT_THRESHOLD = 0.2
+
+QUARTER_CASES = [
+    ("NVIDIA (NVDA) Q4 2025 Earnings Call Transcript", "https://www.fool.com/earnings/call-transcripts/2025/02/26/nvidia-nvda-q4-2025/", "Feb 26, 2025"),
+    ("NVIDIA Earnings Call", "https://www.fool.com/earnings/call-transcripts/nvda/q3-2025/", "Unknown Date"),
+    ("NVIDIA Earnings Call", "https://www.fool.com/earnings/call-transcripts/nvda/", "August 28, 2024"),
+    ("NVIDIA Earnings Call", "https://www.fool.com/earnings/call-transcripts/2024-05-22-nvidia/", "Unknown Date"),
+]
+JSON_CASES = [
+    '{"sentiment": "positive", "confidence": 0.85}',
+    'Here is the analysis:\n```json\n{"themes": ["Data Center", "Generative AI", "Networking"]}\n```',
+    'sentiment follows: "sentiment": "negative", "confidence": 0.7, "themes": ["Supply", "Export Controls"]',
+]
+
+def summarize(samples, elapsed=None):
+    """p50/p99 latency in ms and throughput; elapsed is the wall time when samples ran concurrently"""
+    ms = np.array(samples) * 1000
+    return {
+        "n": len(samples),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "ops_per_s": round(len(samples) / (elapsed if elapsed else sum(samples)), 1),
+    }
+
+def measure(fn, iterations, setup=None):
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def micro_benchmarks(pages, iterations):
+    from html_parsing import parse_transcript_parts
+    from nlp_analyzer import parse_json
+    from segmentation import segment
+    from transcript_fetcher import determine_quarter
+
+    parts = parse_transcript_parts(pages[0])
+    return {
+        "determine_quarter": measure(lambda: [determine_quarter(*case) for case in QUARTER_CASES], iterations * 10),
+        "parse_json": measure(lambda: [parse_json(case) for case in JSON_CASES], iterations * 10),
+        "paragraph_extraction": measure(lambda: parse_transcript_parts(pages[0]), iterations),
+        # Paragraph cleaning and the Q&A split are one pass over the paragraphs
+        "segment": measure(lambda: segment(parts.paragraphs), iterations),
+    }
+
+def e2e_benchmarks(workdir, iterations):
+    import nlp_analyzer
+    from llm_cache import ResultCache
+    from nlp_analyzer import analyze_transcripts
+    from transcript_fetcher import fetch_transcripts
+    from transcript_store import TranscriptStore
+
+    run = iter(range(10 ** 6))
+
+    def cold_setup():
+        # Fresh stores: every page is downloaded in full and every section goes to the LLM
+        index = next(run)
+        state["store"] = TranscriptStore(os.path.join(workdir, f"cold-{index}.db"))
+        nlp_analyzer._result_cache = ResultCache(os.path.join(workdir, f"cold-llm-{index}.db"))
+
+    def pipeline():
+        transcripts = fetch_transcripts(store=state["store"])
+        assert transcripts, "the stand-in site returned no transcripts"
+        analyze_transcripts(transcripts)
+
+    state = {}
+    results = {"e2e_cold": measure(pipeline, iterations, setup=cold_setup)}
+    # Warm: the same stores again, so pages revalidate with 304s and analyses come from the cache
+    results["e2e_warm"] = measure(pipeline, iterations)
+    return results
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def load_benchmarks(iterations, concurrency):
+    import requests
+    import uvicorn
+
+    from app import app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    url = f"http://127.0.0.1:{port}/api/analysis"
+    try:
+        # The first request builds the analysis; only steady-state serving is measured
+        etag = requests.get(url, timeout=600).headers["ETag"]
+        variants = {
+            "load_analysis": {"Accept-Encoding": "identity"},
+            "load_analysis_gzip": {"Accept-Encoding": "gzip"},
+            "load_analysis_not_modified": {"If-None-Match": etag},
+        }
+        results = {}
+        for name, headers in variants.items():
+            sessions = threading.local()
+
+            def request(_):
+                if not hasattr(sessions, "session"):
+                    sessions.session = requests.Session()
+                start = time.perf_counter()
+                response = sessions.session.get(url, headers=headers, timeout=30)
+                assert response.status_code in (200, 304), f"{name}: HTTP {response.status_code}"
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                samples = list(executor.map(request, range(iterations * concurrency)))
+            results[name] = summarize(samples, time.perf_counter() - start)
+        return results
+    finally:
+        server.should_exit = True
+        thread.join()
+
+def startup_benchmarks(iterations):
+    """Worker cold start: a fresh interpreter importing the app, as an autoscaled replica would"""
+    backend = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=backend)
+    command = [sys.executable, "-c", "import app"]
+    return {"startup_import": measure(lambda: subprocess.run(command, env=env, check=True, capture_output=True), iterations)}
+
+def compare(results, baseline, threshold):
+    """Print each benchmark against the baseline; returns the names that regressed"""
+    regressed = []
+    print(f"{'benchmark':<28} {'n':>6} {'p50 ms':>10} {'p99 ms':>10} {'ops/s':>10}  vs baseline p50")
+    for name, result in results.items():
+        line = f"{name:<28} {result['n']:>6} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} {result['ops_per_s']:>10.1f}"
+        previous = baseline.get(name)
+        if previous:
+            change = result["p50_ms"] / previous["p50_ms"] - 1 if previous["p50_ms"] else 0.0
+            line += f"  {change:+7.1%}"
+            if change > threshold:
+                line += "  REGRESSION"
+                regressed.append(name)
+        print(line)
+    return regressed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument("--suite", default=",".join(SUITES), help=f"comma-separated suites to run ({', '.join(SUITES)})")
+    parser.add_argument("--iterations", type=int, default=20, help="samples per benchmark (end-to-end runs use a quarter)")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients in the load test")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds the fake LLM takes per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake LLM requests that fail")
+    parser.add_argument("--site-latency", type=float, default=0.01, help="seconds the fake site takes per page")
+    parser.add_argument("--site-slow-rate", type=float, default=0.0, help="share of fake site pages that take 2s instead")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="p50 slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    suites = [suite.strip() for suite in args.suite.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    logging.disable(logging.WARNING)
+    pages = stand_ins.load_pages()
+    workdir = tempfile.mkdtemp(prefix="earnings-bench-")
+    cwd = os.getcwd()
+    with stand_ins.fool_site(pages, args.site_latency, args.site_slow_rate, seed=0) as site, \
+            stand_ins.fake_llm(args.llm_latency, args.error_rate, seed=0) as llm:
+        # Configuration is read at import, so the backend modules are only imported from here on
+        os.environ.update({
+            "FOOL_SITE_ROOT": site.url,
+            "DEEPSEEK_BASE_URL": f"{llm.url}/v1",
+            "DEEPSEEK_API_KEY": "stand-in",
+            "SENTIMENT_TIER": "llm",
+            "FETCH_REQUESTS_PER_MINUTE": "60000",
+            "LLM_REQUESTS_PER_MINUTE": "60000",
+            "TRANSCRIPT_DB": os.path.join(workdir, "transcripts.db"),
+            "LLM_CACHE_DB": os.path.join(workdir, "llm_cache.db"),
+            "ANALYSIS_DB": os.path.join(workdir, "analysis_cache.db"),
+            # Token counts use a prepared TIKTOKEN_CACHE_DIR if there is one, never a download
+            "TIKTOKEN_DOWNLOAD": "0",
+        })
+        # JSON cache files are read and exported in the working directory; keep the real ones out of it
+        os.chdir(workdir)
+        results = {}
+        if "micro" in suites:
+            results.update(micro_benchmarks(pages, args.iterations))
+        if "e2e" in suites:
+            results.update(e2e_benchmarks(workdir, max(1, args.iterations // 4)))
+        if "load" in suites:
+            results.update(load_benchmarks(args.iterations, args.concurrency))
+        if "startup" in suites:
+            results.update(startup_benchmarks(max(3, args.iterations // 4)))
+        llm_counters = dict(llm.counters)
+    os.chdir(cwd)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressed = compare(results, baseline, args.threshold)
+    print(f"fake LLM: {llm_counters['requests']} requests, {llm_counters['errors']} failed")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif regressed:
+        print(f"{len(regressed)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressed)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
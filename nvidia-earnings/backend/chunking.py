@@ -0,0 +1,136 @@
+"""Token counting and chunking for LLM prompts.
+
+tiktoken downloads the cl100k_base encoding (about 1.7 MB) on first use and caches it
+in TIKTOKEN_CACHE_DIR, or a temporary directory when that is unset. Servers without
+access to openaipublic.blob.core.windows.net should set TIKTOKEN_CACHE_DIR and fill it
+once from a machine that has access:
+
+    TIKTOKEN_CACHE_DIR=/srv/tiktoken python chunking.py
+
+then ship that directory with the deployment. With TIKTOKEN_DOWNLOAD=0 the encoding is
+only ever read from the cache. Without the encoding, token counts are estimated.
+"""
+import hashlib
+import logging
+import os
+import re
+import sys
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# DeepSeek ships no tiktoken encoding; cl100k_base is a close BPE approximation
+ENCODING_NAME = "cl100k_base"
+# Where tiktoken downloads the encoding from; its cache file is named after this URL
+ENCODING_URL = "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken"
+# "0" never downloads the encoding, using it only when TIKTOKEN_CACHE_DIR already has it
+DOWNLOAD = os.getenv("TIKTOKEN_DOWNLOAD", "1") != "0"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+_encoding = None
+# Set once loading the encoding failed, so it is not downloaded again for every count
+_encoding_failed = False
+
+def cached_encoding_path():
+    """Where tiktoken caches the encoding under TIKTOKEN_CACHE_DIR, or None when that is unset"""
+    cache_dir = os.getenv("TIKTOKEN_CACHE_DIR")
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, hashlib.sha1(ENCODING_URL.encode()).hexdigest())
+
+def get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and tiktoken is not None and not _encoding_failed:
+        try:
+            if not DOWNLOAD and not os.path.exists(cached_encoding_path() or ""):
+                raise FileNotFoundError(f"not in TIKTOKEN_CACHE_DIR ({os.getenv('TIKTOKEN_CACHE_DIR')}) and TIKTOKEN_DOWNLOAD=0")
+            _encoding = tiktoken.get_encoding(ENCODING_NAME)
+        except Exception as e:
+            _encoding_failed = True
+            logger.warning(
+                f"tiktoken encoding {ENCODING_NAME} unavailable ({e}); token counts are estimated until "
+                f"restart. Fill TIKTOKEN_CACHE_DIR with `python chunking.py` (see chunking.py)"
+            )
+    return _encoding
+
+def is_estimated():
+    """True when token counts come from the word estimate rather than the BPE tokenizer"""
+    return get_encoding() is None
+
+def count_tokens(text):
+    """Token count from a BPE tokenizer, or a word/punctuation estimate when tiktoken is missing"""
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(_WORD.findall(text))
+
+def split_into_chunks(text, max_tokens):
+    """Pack whole paragraphs (speaker turns) into chunks of at most max_tokens.
+
+    Packing is greedy from the start of the text, so appending to a section leaves
+    every earlier chunk, and therefore its cached analysis, unchanged.
+    """
+    if is_estimated():
+        logger.warning(f"Chunking with estimated token counts; chunks may be off the {max_tokens}-token budget")
+    chunks = []
+    current, current_tokens = [], 0
+    for piece, tokens in _pieces(text, max_tokens):
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def _pieces(text, max_tokens):
+    """Paragraphs with their token counts; oversized ones are split by sentence, then by token"""
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens <= max_tokens:
+            yield paragraph, tokens
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            sentence_tokens = count_tokens(sentence)
+            if sentence_tokens <= max_tokens:
+                yield sentence, sentence_tokens
+            else:
+                yield from _hard_split(sentence, max_tokens)
+
+def _hard_split(text, max_tokens):
+    encoding = get_encoding()
+    if encoding is not None:
+        ids = encoding.encode(text, disallowed_special=())
+        for start in range(0, len(ids), max_tokens):
+            piece = ids[start:start + max_tokens]
+            yield encoding.decode(piece), len(piece)
+        return
+    words = text.split()
+    for start in range(0, len(words), max_tokens):
+        piece = " ".join(words[start:start + max_tokens])
+        yield piece, count_tokens(piece)
+
+def main():
+    """Download the encoding into TIKTOKEN_CACHE_DIR, for deployments without internet access"""
+    if tiktoken is None:
+        print("tiktoken is not installed")
+        return 1
+    if not os.getenv("TIKTOKEN_CACHE_DIR"):
+        print("Set TIKTOKEN_CACHE_DIR to the directory to ship with the deployment")
+        return 1
+    tiktoken.get_encoding(ENCODING_NAME)
+    print(f"{ENCODING_NAME} cached at {cached_encoding_path()}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
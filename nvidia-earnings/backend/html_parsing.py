@@ -0,0 +1,182 @@
+import logging
+import os
+from collections import namedtuple
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from metrics import timed
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml  # noqa: F401  (only needed as a BeautifulSoup tree builder)
+except ImportError:
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+# "auto" picks the fastest installed engine; "selectolax", "lxml" or "html.parser" force one
+HTML_PARSER = os.getenv("HTML_PARSER", "auto").lower()
+
+TRANSCRIPT_PATH = "/earnings-call-transcripts/"
+
+# Selectors tried in order; the first match wins
+TITLE_SELECTORS = ["h1.font-bold", "h1.title", "h1"]
+DATE_SELECTORS = ["time", "span.text-tertiary-text", "span.date"]
+CONTENT_SELECTORS = ["div.article-content", "div.break-words", "div.article-body", "article", "div.content"]
+
+TranscriptParts = namedtuple("TranscriptParts", ["title", "date", "paragraphs"])
+
+class BeautifulSoupEngine:
+    """BeautifulSoup with the given tree builder, optionally building only the subtrees we read"""
+
+    def __init__(self, builder, restricted=False):
+        self.name = builder
+        self.builder = builder
+        self.restricted = restricted
+
+    def _soup(self, html, strainer):
+        if self.restricted:
+            return BeautifulSoup(html, self.builder, parse_only=strainer)
+        return BeautifulSoup(html, self.builder)
+
+    def listing_links(self, html, keywords=("nvidia",)):
+        # Card elements and their descendants are all the primary detection looks at
+        soup = self._soup(html, SoupStrainer(class_="card"))
+        cards = soup.select("article.card") or soup.select("div.card")
+        links = []
+        for card in cards[:8]:
+            link = card.select_one(f'a[href*="{TRANSCRIPT_PATH}"]') or card.select_one("a")
+            if link and link.get("href"):
+                links.append(link["href"])
+        if links:
+            return links
+
+        # Alternative detection scans every link on the page
+        if self.restricted:
+            soup = self._soup(html, SoupStrainer("a", href=True))
+        return [
+            a["href"] for a in soup.find_all("a", href=True)
+            if TRANSCRIPT_PATH in a["href"] and mentions(a.get_text(" ", strip=True), keywords)
+        ]
+
+    def transcript_parts(self, html):
+        # Every selector is a plain tag/class match, so dropping unmatched branches cannot change results
+        strainer = SoupStrainer(["h1", "time", "span", "div", "article"])
+        soup = self._soup(html, strainer)
+
+        title_el = first_match(soup.select_one, TITLE_SELECTORS)
+        date_el = first_match(soup.select_one, DATE_SELECTORS)
+        date = None
+        if date_el:
+            datetime_attr = date_el.get("datetime")
+            date = datetime_attr.split("T")[0] if datetime_attr else date_el.get_text(strip=True)
+
+        article_el = first_match(soup.select_one, CONTENT_SELECTORS)
+        paragraphs = [p.get_text(strip=True) for p in article_el.find_all("p")] if article_el else []
+        return TranscriptParts(title_el.get_text(strip=True) if title_el else None, date, paragraphs)
+
+class SelectolaxEngine:
+    """selectolax's lexbor backend: a C HTML5 parser with native CSS selectors"""
+
+    name = "selectolax"
+
+    def listing_links(self, html, keywords=("nvidia",)):
+        tree = LexborHTMLParser(html)
+        cards = tree.css("article.card") or tree.css("div.card")
+        links = []
+        for card in cards[:8]:
+            link = card.css_first(f'a[href*="{TRANSCRIPT_PATH}"]') or card.css_first("a")
+            href = link.attributes.get("href") if link else None
+            if href:
+                links.append(href)
+        if links:
+            return links
+
+        return [
+            a.attributes["href"] for a in tree.css("a[href]")
+            if a.attributes["href"] and TRANSCRIPT_PATH in a.attributes["href"]
+            and mentions(a.text(separator=" ", strip=True), keywords)
+        ]
+
+    def transcript_parts(self, html):
+        tree = LexborHTMLParser(html)
+
+        title_el = first_match(tree.css_first, TITLE_SELECTORS)
+        date_el = first_match(tree.css_first, DATE_SELECTORS)
+        date = None
+        if date_el:
+            datetime_attr = date_el.attributes.get("datetime")
+            date = datetime_attr.split("T")[0] if datetime_attr else date_el.text(strip=True)
+
+        article_el = first_match(tree.css_first, CONTENT_SELECTORS)
+        paragraphs = [p.text(strip=True) for p in article_el.css("p")] if article_el else []
+        return TranscriptParts(title_el.text(strip=True) if title_el else None, date, paragraphs)
+
+def mentions(text, keywords):
+    text = text.lower()
+    return any(keyword in text for keyword in keywords)
+
+def first_match(select_one, selectors):
+    for selector in selectors:
+        element = select_one(selector)
+        if element:
+            return element
+    return None
+
+FALLBACK_ENGINE = BeautifulSoupEngine("html.parser")
+
+def available_engines():
+    """Every engine usable in this environment, fastest first, ending with the pure-Python fallback"""
+    engines = []
+    if LexborHTMLParser is not None:
+        engines.append(SelectolaxEngine())
+    if lxml is not None:
+        engines.append(BeautifulSoupEngine("lxml", restricted=True))
+    engines.append(FALLBACK_ENGINE)
+    return engines
+
+def get_engine(name=HTML_PARSER):
+    engines = available_engines()
+    if name == "auto":
+        return engines[0]
+    for engine in engines:
+        if engine.name == name:
+            return engine
+    logger.warning(f"HTML parser '{name}' is not available, using {FALLBACK_ENGINE.name}")
+    return FALLBACK_ENGINE
+
+_engine = None
+
+def _active_engine():
+    global _engine
+    if _engine is None:
+        _engine = get_engine()
+        logger.info(f"Using HTML parser: {_engine.name}")
+    return _engine
+
+def _with_fallback(method, html, found, engine=None, **kwargs):
+    """Run method on the engine (default: configured one), re-parsing with html.parser if it fails or finds nothing"""
+    engine = engine or _active_engine()
+    with timed("html_parse"):
+        try:
+            result = getattr(engine, method)(html, **kwargs)
+            if engine is FALLBACK_ENGINE or found(result):
+                return result
+            logger.warning(f"{engine.name} found nothing in page, retrying with {FALLBACK_ENGINE.name}")
+        except Exception as e:
+            if engine is FALLBACK_ENGINE:
+                raise
+            logger.warning(f"{engine.name} failed ({e}), retrying with {FALLBACK_ENGINE.name}")
+        return getattr(FALLBACK_ENGINE, method)(html, **kwargs)
+
+def parse_listing_links(html, engine=None, keywords=("nvidia",)):
+    """Transcript hrefs from a listing page, in page order; keywords identify the company in link text"""
+    return _with_fallback("listing_links", html, bool, engine, keywords=keywords)
+
+def parse_transcript_parts(html, engine=None):
+    """Title, date and article paragraphs from a transcript page; missing parts are None/empty"""
+    return _with_fallback("transcript_parts", html, lambda parts: bool(parts.paragraphs), engine)
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_DB", "llm_cache.db")
+DEFAULT_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_results (
+    key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+)
+"""
+
+def make_key(*parts):
+    """Content address for an LLM result, e.g. (text, prompt version, model, temperature)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+class ResultCache:
+    """On-disk LLM result cache with size-based LRU eviction"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT result FROM llm_results WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("UPDATE llm_results SET last_access = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, result):
+        payload = json.dumps(result)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_results (key, result, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time())
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM llm_results ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_results WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        with self._lock:
+            self.evictions += evicted
+        logger.info(f"Evicted {evicted} cached LLM results")
+
+    def stats(self):
+        with self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_results").fetchone()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": size,
+            }
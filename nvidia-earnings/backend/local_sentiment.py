@@ -0,0 +1,93 @@
+import re
+
+import numpy as np
+
+# Compact financial tone lexicon in the spirit of Loughran-McDonald, tuned for earnings calls
+POSITIVE_WORDS = """
+accelerate accelerated accelerating achieve achieved achievement advance advanced advancing
+benefit benefited benefiting beat best better breakthrough confident confidence delivered
+demand efficiency efficient enable enabled enabling encouraged encouraging excellent exceeded
+exceptional excited exciting expand expanded expanding expansion extraordinary favorable gain
+gained gains good great grew grow growing growth highest improve improved improvement improving
+increase increased increasing incredible innovation innovative leadership leading momentum
+opportunities opportunity outperform outstanding pleased positive profitable profitability
+progress record records robust solid strength strengthen strong stronger strongest succeed
+success successful surge surged surpassed tremendous upside win winning wins
+""".split()
+
+NEGATIVE_WORDS = """
+adverse adversely challenge challenged challenges challenging concern concerned concerns
+constrain constrained constraint constraints decline declined declines declining decrease
+decreased decreasing deficit delay delayed delays difficult difficulties difficulty disappoint
+disappointed disappointing disruption disruptions downturn drop dropped failure fell
+headwind headwinds impairment lower loss losses negative negatively pressure pressured
+pressures restriction restrictions risk risks shortage shortages slow slowdown slowed slower
+softness uncertain uncertainties uncertainty unfavorable weak weaker weakness worse worsen
+""".split()
+
+# NVIDIA's strategic focuses recognised locally, as (label, pattern); other tickers need the LLM for themes
+THEMES = [
+    ("Data Center", r"data cent(?:er|re)s?"),
+    ("Generative AI", r"generative ai|large language models?|llms?"),
+    ("AI Inference", r"inference"),
+    ("Blackwell Platform", r"blackwell"),
+    ("Hopper Platform", r"hopper|h100|h200"),
+    ("Networking", r"networking|infiniband|spectrum-x|ethernet"),
+    ("Sovereign AI", r"sovereign ai"),
+    ("Gaming", r"gaming|geforce|rtx"),
+    ("Automotive", r"automotive|self-driving|autonomous"),
+    ("Professional Visualization", r"professional visualization|omniverse"),
+    ("Software and Services", r"software|cuda|nvidia ai enterprise"),
+    ("Supply Chain", r"supply chain|supply|capacity"),
+    ("Cloud Providers", r"cloud service providers?|hyperscalers?|csps?"),
+]
+
+_WORD_RE = re.compile(r"[a-z][a-z'-]*")
+
+VOCABULARY = {word: index for index, word in enumerate(POSITIVE_WORDS + NEGATIVE_WORDS)}
+POLARITY = np.array([1.0] * len(POSITIVE_WORDS) + [-1.0] * len(NEGATIVE_WORDS))
+_THEME_PATTERNS = [re.compile(rf"\b(?:{pattern})\b", re.IGNORECASE) for _, pattern in THEMES]
+
+# Net tone magnitude below which a section reads as neutral
+NEUTRAL_BAND = 0.15
+# Lexicon hits needed before the scorer trusts its own label
+EVIDENCE_SCALE = 12.0
+
+def score_sections(texts):
+    """Score many sections at once; returns analyze_section-shaped dicts in input order.
+
+    Lexicon hits are counted into one (sections x vocabulary) matrix, so polarity,
+    net tone and confidence are computed for every section in a few array operations.
+    """
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        for word in _WORD_RE.findall((text or "").lower()):
+            index = VOCABULARY.get(word)
+            if index is not None:
+                rows.append(row)
+                cols.append(index)
+
+    counts = np.zeros((len(texts), len(VOCABULARY)))
+    np.add.at(counts, (np.array(rows, dtype=int), np.array(cols, dtype=int)), 1)
+
+    positive = counts[:, POLARITY > 0].sum(axis=1)
+    negative = counts[:, POLARITY < 0].sum(axis=1)
+    hits = positive + negative
+    net = np.divide(positive - negative, hits, out=np.zeros_like(hits), where=hits > 0)
+
+    # Confidence grows with how one-sided the tone is and how much evidence backs it
+    evidence = 1.0 - np.exp(-hits / EVIDENCE_SCALE)
+    strength = np.where(np.abs(net) < NEUTRAL_BAND, 1.0 - np.abs(net) / NEUTRAL_BAND, np.abs(net))
+    confidence = np.round(0.5 + 0.45 * strength * evidence, 3)
+    labels = np.where(net >= NEUTRAL_BAND, "positive", np.where(net <= -NEUTRAL_BAND, "negative", "neutral"))
+
+    return [
+        {"sentiment": str(label), "confidence": float(conf), "themes": detect_themes(text or "")}
+        for label, conf, text in zip(labels, confidence, texts)
+    ]
+
+def detect_themes(text, limit=5):
+    """Most frequently mentioned known strategic focuses"""
+    counts = [(len(pattern.findall(text)), label) for (label, _), pattern in zip(THEMES, _THEME_PATTERNS)]
+    ranked = sorted((c for c in counts if c[0] > 0), key=lambda c: -c[0])
+    return [label for _, label in ranked[:limit]]
@@ -0,0 +1,228 @@
+import contextvars
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Completed traces kept for /metrics/traces
+MAX_TRACES = 50
+
+_registry = []
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Gauge:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def set(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            # Buckets are cumulative: each counts observations at or below its bound
+            buckets, count, total = self._values.get(key, ([0] * len(self.buckets), 0, 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    buckets[i] += 1
+            self._values[key] = buckets, count + 1, total + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (buckets, count, total) in sorted(self._values.items()):
+                for bound, observed in zip(self.buckets, buckets):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {observed}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+STAGE_SECONDS = Histogram(
+    "earnings_stage_seconds",
+    "Time spent per pipeline stage",
+    ["stage"],
+)
+CACHE_REQUESTS = Counter(
+    "earnings_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ["cache", "result"],
+)
+HARDCODED_FALLBACKS = Counter(
+    "earnings_hardcoded_fallback_total",
+    "Times the scraper fell back to the hardcoded transcripts",
+)
+LLM_RETRIES = Counter(
+    "earnings_llm_retries_total",
+    "LLM calls retried after a transient error",
+    ["error"],
+)
+STARTUP_SECONDS = Gauge(
+    "earnings_startup_seconds",
+    "Worker cold start time by phase (import, prewarm)",
+    ["phase"],
+)
+CIRCUIT_OPEN = Gauge(
+    "earnings_circuit_open",
+    "1 while an endpoint's circuit breaker rejects calls",
+    ["endpoint"],
+)
+CIRCUIT_REJECTIONS = Counter(
+    "earnings_circuit_rejections_total",
+    "Calls rejected without trying because the endpoint's circuit was open",
+    ["endpoint"],
+)
+HEDGED_REQUESTS = Counter(
+    "earnings_hedged_requests_total",
+    "Slow calls that got a duplicate request, by which one answered first",
+    ["endpoint", "winner"],
+)
+LLM_TOKENS = Counter(
+    "earnings_llm_tokens_total",
+    "LLM tokens used, by direction (input or output)",
+    ["direction"],
+)
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Per-build traces: the active trace follows the work through threads started with in_context()
+_current_trace = contextvars.ContextVar("trace", default=None)
+_traces = OrderedDict()
+_traces_lock = threading.Lock()
+
+class Trace:
+    def __init__(self, trace_id, name):
+        self.trace_id = trace_id
+        self.name = name
+        self.started = time.time()
+        self.duration = None
+        self.spans = []
+
+    def summary(self):
+        stages = {}
+        for stage, _, seconds in self.spans:
+            total, count = stages.get(stage, (0.0, 0))
+            stages[stage] = total + seconds, count + 1
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started": self.started,
+            "duration": self.duration,
+            "stages": {stage: {"seconds": round(total, 4), "count": count} for stage, (total, count) in stages.items()},
+        }
+
+    def details(self):
+        result = self.summary()
+        result["spans"] = [
+            {"stage": stage, "offset": round(start - self.started, 4), "seconds": round(seconds, 4)}
+            for stage, start, seconds in self.spans
+        ]
+        return result
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+@contextmanager
+def trace(name, trace_id=None):
+    """Record every stage timed inside this block, in any thread started with in_context()"""
+    current = Trace(trace_id or new_trace_id(), name)
+    token = _current_trace.set(current)
+    with _traces_lock:
+        _traces[current.trace_id] = current
+        while len(_traces) > MAX_TRACES:
+            _traces.popitem(last=False)
+    try:
+        yield current
+    finally:
+        current.duration = time.time() - current.started
+        _current_trace.reset(token)
+
+def current_trace_id():
+    current = _current_trace.get()
+    return current.trace_id if current else None
+
+def get_trace(trace_id):
+    with _traces_lock:
+        found = _traces.get(trace_id)
+    return found.details() if found else None
+
+def recent_traces():
+    with _traces_lock:
+        return [t.summary() for t in reversed(_traces.values())]
+
+def in_context(fn):
+    """Wrap fn to run in a copy of the caller's context, so pool threads keep the active trace"""
+    context = contextvars.copy_context()
+    # A context can only be entered once at a time, and the wrapper may run in several threads at once
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+@contextmanager
+def timed(stage):
+    """Observe the block's duration in earnings_stage_seconds and the active trace"""
+    start = time.time()
+    try:
+        yield
+    finally:
+        seconds = time.time() - start
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        current = _current_trace.get()
+        if current is not None:
+            current.spans.append((stage, start, seconds))
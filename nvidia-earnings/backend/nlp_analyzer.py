@@ -2,9 +2,18 @@ import os
 import json
 import re
 import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import numpy as np
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
+from chunking import count_tokens, split_into_chunks
+from llm_cache import ResultCache, make_key
+from local_sentiment import score_sections
+from metrics import CACHE_REQUESTS, LLM_RETRIES, LLM_TOKENS, in_context, timed
+from rate_limiter import RateLimiter
+from resilience import Gate, backoff_delay, get_endpoint
+from segmentation import EXECUTIVE, MANAGEMENT, QA, UNATTRIBUTED, section_text
 
 # Configure logging
 logging.basicConfig(
@@ -15,73 +24,302 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-def analyze_transcripts(transcripts):
-    results = []
+MODEL_NAME = "deepseek-chat"
+BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
+TEMPERATURE = 0.1
+# "separate" sends sentiment and themes prompts, "combined" asks for both in one request
+ANALYSIS_MODE = os.getenv("LLM_ANALYSIS_MODE", "separate").lower()
+# "mapreduce" analyzes whole sections chunk by chunk, "truncate" only the first 6000 characters
+SECTION_STRATEGY = os.getenv("LLM_SECTION_STRATEGY", "mapreduce").lower()
+CHUNK_TOKENS = max(100, int(os.getenv("LLM_CHUNK_TOKENS", "2000")))
+# Every section is scored locally and falls back to that score when the LLM fails.
+# "llm" always calls the LLM, "tiered" keeps confident local scores and escalates unsure
+# sections to it, "local" never calls it (also used automatically when no API key is configured).
+# Local scores take their themes from local_sentiment.THEMES, a table of NVIDIA's focuses,
+# so skipping the LLM ("tiered" and "local") only suits NVIDIA and is opt-in
+SENTIMENT_TIER = os.getenv("SENTIMENT_TIER", "llm").lower()
+LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("LOCAL_CONFIDENCE_THRESHOLD", "0.75"))
+# Bump whenever the sentiment/themes prompts change so cached results are not reused
+PROMPT_VERSION = "1"
+
+# Scheduling limits shared by every analysis running in this process
+LLM_CONCURRENCY = max(1, int(os.getenv("LLM_CONCURRENCY", "4")))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# A call slower than this percentile of recent ones gets a duplicate request; costs tokens, so off (0) by default
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))
+
+# Bursts of LLM_CONCURRENCY, so concurrent sections are not serialized by the rate limit
+_llm_gate = Gate(LLM_CONCURRENCY, RateLimiter(LLM_REQUESTS_PER_MINUTE, burst=LLM_CONCURRENCY))
+
+_llm_clients = {}
+_llm_clients_lock = threading.Lock()
+
+def get_llm(max_retries=0, request_timeout=LLM_TIMEOUT_SECONDS):
+    """Shared ChatOpenAI client per configuration so HTTP connections stay alive between calls"""
+    # langchain and openai take over a second to import; workers serving cached analyses never need them
+    from langchain_openai import ChatOpenAI
+
+    key = (max_retries, request_timeout)
+    with _llm_clients_lock:
+        if key not in _llm_clients:
+            _llm_clients[key] = ChatOpenAI(
+                model=MODEL_NAME,
+                api_key=os.getenv("DEEPSEEK_API_KEY"),
+                base_url=BASE_URL,
+                temperature=TEMPERATURE,
+                max_retries=max_retries,
+                request_timeout=request_timeout
+            )
+        return _llm_clients[key]
+
+_result_cache = None
+
+def get_result_cache():
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
+
+def analyze_transcripts(transcripts, on_result=None, company="NVIDIA"):
+    """Analyze all transcripts; on_result(index, result) is called as each quarter finishes"""
     logger.info(f"Starting analysis of {len(transcripts)} transcripts")
-    
+    results = [None] * len(transcripts)
+
+    texts = []
     for transcript in transcripts:
         quarter = transcript.get("quarter", "Unknown Quarter")
         date = transcript.get("date", "Unknown Date")
         logger.info(f"Analyzing {quarter} transcript from {date}")
-        
-        management_text = transcript.get("management", "")
-        qa_text = transcript.get("qa", "")
-        
+
+        # Management tone comes from executives only, skipping operator boilerplate
+        management_text = section_text(transcript, MANAGEMENT, roles=(EXECUTIVE, UNATTRIBUTED))
+        qa_text = section_text(transcript, QA)
+
         # Log text length for debugging
         logger.info(f"Management text length: {len(management_text)}")
         logger.info(f"QA text length: {len(qa_text)}")
+        texts.append((management_text, qa_text))
+
+    # One vectorized local pass over every section: the fallback for failed LLM calls,
+    # and in the "tiered" tier also what decides which sections need the LLM
+    tier = sentiment_tier()
+    scores = score_sections([text for pair in texts for text in pair])
+    local = [(scores[2 * i], scores[2 * i + 1]) for i in range(len(texts))]
 
-        # Analyze sections
-        mgmt_analysis = analyze_section(management_text, "management discussion")
-        qa_analysis = analyze_section(qa_text, "Q&A session") if qa_text else {
-            "sentiment": "neutral",
-            "confidence": 0.5,
-            "themes": []
-        }
-
-        results.append({
-            "quarter": quarter,
-            "date": date,
-            "management": mgmt_analysis,
-            "qa": qa_analysis,
-            "content": transcript.get("content", "")
-        })
+    # Analyze every section concurrently; LLM calls are capped by the shared scheduler
+    with ThreadPoolExecutor(max_workers=LLM_CONCURRENCY) as executor:
+        sections = []
+        for i, (management_text, qa_text) in enumerate(texts):
+            mgmt_local, qa_local = local[i]
+            sections.append((
+                executor.submit(in_context(analyze_tiered), management_text, "management discussion", mgmt_local, tier, company),
+                executor.submit(in_context(analyze_tiered), qa_text, "Q&A session", qa_local, tier, company) if qa_text else None,
+            ))
 
+        # Assemble each quarter as soon as both of its sections are done
+        pending = {future: index for index, pair in enumerate(sections) for future in pair if future}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                mgmt_future, qa_future = sections[index]
+                if results[index] is not None or not all(f.done() for f in (mgmt_future, qa_future) if f):
+                    continue
+                transcript = transcripts[index]
+                results[index] = {
+                    "quarter": transcript.get("quarter", "Unknown Quarter"),
+                    "date": transcript.get("date", "Unknown Date"),
+                    "management": mgmt_future.result(),
+                    "qa": qa_future.result() if qa_future else neutral_result(),
+                    "content": transcript.get("content", "")
+                }
+                if on_result:
+                    on_result(index, results[index])
+
+    # Results stay in transcript order so tone changes are deterministic
     calculate_tone_changes(results)
+    logger.info(f"LLM result cache: {get_result_cache().stats()}")
     logger.info("Analysis completed successfully")
     return results
 
-def analyze_section(text, section_type):
+def sentiment_tier():
+    """Effective tier: LLM calls need an API key"""
+    if SENTIMENT_TIER != "local" and not os.getenv("DEEPSEEK_API_KEY"):
+        logger.warning("DEEPSEEK_API_KEY is not set, using local sentiment scoring only")
+        return "local"
+    return SENTIMENT_TIER
+
+def analyze_tiered(text, section_type, local, tier, company="NVIDIA"):
+    """Keep the local score where the tier allows, otherwise ask the LLM (falling back to the local score on failure)"""
+    if tier == "local" or (tier == "tiered" and local["confidence"] >= LOCAL_CONFIDENCE_THRESHOLD):
+        logger.info(f"Local {section_type} score: {local['sentiment']} ({local['confidence']})")
+        return local
+    if tier == "tiered":
+        logger.info(f"Local {section_type} score unsure ({local['confidence']}), escalating to LLM")
+    if company != "NVIDIA":
+        # The local theme table is NVIDIA's; other companies fall back to sentiment only
+        local = dict(local, themes=[])
+    return analyze_section(text, section_type, fallback=local, company=company)
+
+def invoke_llm(llm, prompt):
+    """Invoke the LLM under the shared concurrency cap and rate limit, retrying transient errors"""
+    from langchain_core.messages import HumanMessage
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+    # An open circuit fails the call at once, so sections fall back to their local score
+    endpoint = get_endpoint("deepseek", hedge_percentile=LLM_HEDGE_PERCENTILE, gate=_llm_gate, is_failure=is_transient)
+
+    def call():
+        with timed("llm_call"):
+            return llm.invoke([HumanMessage(content=prompt)])
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            response = endpoint.call(call)
+            record_usage(response)
+            return response
+        except (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError) as e:
+            if attempt == LLM_MAX_RETRIES or endpoint.breaker.is_open():
+                raise
+            LLM_RETRIES.inc(error=type(e).__name__)
+            delay = retry_delay(e, attempt)
+            logger.warning(f"LLM call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def is_transient(error):
+    """Rate limits, timeouts, connection and server errors; a 400 says nothing about DeepSeek's health"""
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+    return isinstance(error, (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError))
+
+def record_usage(response):
+    """Count the tokens a response reports using"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    LLM_TOKENS.inc(usage.get("input_tokens", 0), direction="input")
+    LLM_TOKENS.inc(usage.get("output_tokens", 0), direction="output")
+
+def retry_delay(error, attempt):
+    """Honour Retry-After on 429s, otherwise back off exponentially with jitter"""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return backoff_delay(attempt)
+
+def neutral_result():
+    return {
+        "sentiment": "neutral",
+        "confidence": 0.5,
+        "themes": []
+    }
+
+def analyze_section(text, section_type, fallback=None, company="NVIDIA"):
     # Check for sufficient text
     if not text or len(text.strip()) < 100:
         logger.warning(f"Skipping {section_type} analysis: insufficient text")
-        return {
-            "sentiment": "neutral",
-            "confidence": 0.5,
-            "themes": []
-        }
+        return neutral_result()
 
     # Calculate token count
-    token_count = len(text.split())
+    token_count = count_tokens(text)
     logger.info(f"Analyzing {section_type} ({token_count} tokens)")
-    
-    # Truncate to avoid exceeding model limits
-    truncated = text[:6000]
 
-    # Initialize LLM
-    llm = ChatOpenAI(
-        model="deepseek-chat",
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-        base_url="https://api.deepseek.com/v1",
-        temperature=0.1,
-        max_retries=3,
-        request_timeout=60
-    )
+    if SECTION_STRATEGY == "truncate":
+        # Truncate to avoid exceeding model limits
+        return analyze_chunk(text[:6000], section_type, fallback, company)
+
+    # Map: analyze every chunk in parallel (each one cached on its own); reduce: merge by length
+    chunks = split_into_chunks(text, CHUNK_TOKENS)
+    if len(chunks) == 1:
+        return analyze_chunk(chunks[0], section_type, fallback, company)
+
+    logger.info(f"Splitting {section_type} into {len(chunks)} chunks of up to {CHUNK_TOKENS} tokens")
+
+    def analyze_or_none(chunk):
+        try:
+            return request_analysis(chunk, section_type, company)
+        except Exception as e:
+            logger.error(f"Error analyzing a {section_type} chunk: {str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(LLM_CONCURRENCY, len(chunks))) as executor:
+        results = list(executor.map(in_context(analyze_or_none), chunks))
+    # A failed chunk was never judged, so it is left out rather than counted as neutral
+    analyzed = [(result, count_tokens(chunk)) for result, chunk in zip(results, chunks) if result is not None]
+    if not analyzed:
+        return fallback or neutral_result()
+    if len(analyzed) < len(chunks):
+        logger.warning(f"Merging {len(analyzed)} of {len(chunks)} {section_type} chunks, the others failed")
+    return merge_results(*zip(*analyzed))
+
+def merge_results(results, weights):
+    """Combine per-chunk results, weighting each chunk by its token count.
+
+    The sentiment with the most confidence-weighted mass wins; its confidence is that mass
+    over the total weight, so disagreeing chunks lower it. Themes are ranked by the total
+    weight of the chunks that mention them.
+    """
+    total = sum(weights) or 1
+    mass = {}
+    theme_weights = {}
+    theme_names = {}
+    for result, weight in zip(results, weights):
+        mass[result["sentiment"]] = mass.get(result["sentiment"], 0) + weight * result["confidence"]
+        for theme in result["themes"]:
+            key = theme.lower()
+            theme_names.setdefault(key, theme)
+            theme_weights[key] = theme_weights.get(key, 0) + weight
+
+    sentiment = max(mass, key=mass.get)
+    # sorted() is stable, so equally weighted themes keep their first-seen order
+    themes = sorted(theme_weights, key=theme_weights.get, reverse=True)[:5]
+    return {
+        "sentiment": sentiment,
+        "confidence": round(mass[sentiment] / total, 3),
+        "themes": [theme_names[key] for key in themes]
+    }
+
+def string_themes(themes):
+    """The non-blank string themes of an answer, stripped; the LLM sometimes returns objects instead"""
+    if not isinstance(themes, list):
+        return []
+    return [theme.strip() for theme in themes if isinstance(theme, str) and theme.strip()]
+
+def analyze_chunk(text, section_type, fallback=None, company="NVIDIA"):
+    """Analyze one piece of a section with the LLM, reusing cached results; fallback is returned on errors"""
+    try:
+        return request_analysis(text, section_type, company)
+    except Exception as e:
+        logger.error(f"Error analyzing {section_type}: {str(e)}")
+        return fallback or neutral_result()
+
+def request_analysis(text, section_type, company="NVIDIA"):
+    """Analyze one piece of a section with the LLM, reusing cached results; raises when the LLM fails"""
+    if not text or len(text.strip()) < 100:
+        return neutral_result()
+
+    # Reuse a previous result for identical text, prompt and model settings
+    cache = get_result_cache()
+    cache_key = make_key(text, section_type, company, ANALYSIS_MODE, PROMPT_VERSION, MODEL_NAME, TEMPERATURE)
+    cached = cache.get(cache_key)
+    CACHE_REQUESTS.inc(cache="llm_result", result="miss" if cached is None else "hit")
+    if cached is not None:
+        logger.info(f"Using cached {section_type} analysis")
+        # Results cached before themes were validated may hold non-string themes
+        return dict(cached, themes=string_themes(cached.get("themes")))
+
+    # Retries go through invoke_llm so they respect the rate limit
+    llm = get_llm(max_retries=0)
 
     # Sentiment analysis prompt
     sentiment_prompt = f"""
-    Analyze the sentiment in the following NVIDIA earnings call {section_type} section. 
-    Focus on the overall tone expressed by NVIDIA management regarding their business performance and outlook.
+    Analyze the sentiment in the following {company} earnings call {section_type} section. 
+    Focus on the overall tone expressed by {company} management regarding their business performance and outlook.
     
     Return ONLY valid JSON in this format:
     {{
@@ -90,13 +328,13 @@ def analyze_section(text, section_type):
     }}
     
     Transcript section:
-    {truncated}
+    {text}
     """
     
     # Themes analysis prompt
     themes_prompt = f"""
-    Identify 3-5 key strategic business focuses in this NVIDIA earnings call {section_type}.
-    Focus specifically on NVIDIA's business strategies, technologies, and market opportunities.
+    Identify 3-5 key strategic business focuses in this {company} earnings call {section_type}.
+    Focus specifically on {company}'s business strategies, technologies, and market opportunities.
     
     Return ONLY valid JSON in this format:
     {{
@@ -104,60 +342,73 @@ def analyze_section(text, section_type):
     }}
     
     Transcript section:
-    {truncated}
+    {text}
     """
 
-    try:
-        # Get sentiment analysis
-        logger.info("Sending sentiment analysis request...")
-        sentiment_response = llm.invoke([HumanMessage(content=sentiment_prompt)])
+    # Combined prompt: sentiment and themes in a single structured response
+    combined_prompt = f"""
+    Analyze the following {company} earnings call {section_type} section.
+    Judge the overall tone expressed by {company} management regarding their business performance and outlook,
+    and identify 3-5 key strategic business focuses (business strategies, technologies, market opportunities).
+    
+    Return ONLY valid JSON in this format:
+    {{
+        "sentiment": "positive|neutral|negative",
+        "confidence": float_value_between_0_and_1,
+        "themes": ["theme1", "theme2", ...]
+    }}
+    
+    Transcript section:
+    {text}
+    """
+
+    if ANALYSIS_MODE == "combined":
+        logger.info("Sending combined analysis request...")
+        combined_response = invoke_llm(llm, combined_prompt)
+        logger.info(f"Raw combined response: {combined_response.content}")
+        sentiment_data = themes_data = parse_json(combined_response.content)
+    else:
+        # Send sentiment and themes requests in parallel
+        logger.info("Sending sentiment and themes analysis requests...")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            sentiment_future = executor.submit(in_context(invoke_llm), llm, sentiment_prompt)
+            themes_future = executor.submit(in_context(invoke_llm), llm, themes_prompt)
+            sentiment_response = sentiment_future.result()
+            themes_response = themes_future.result()
+
         logger.info(f"Raw sentiment response: {sentiment_response.content}")
         sentiment_data = parse_json(sentiment_response.content)
-        logger.info(f"Sentiment: {sentiment_data.get('sentiment', 'neutral')} (Confidence: {sentiment_data.get('confidence', 0.5)})")
-        
-        # Get themes analysis
-        logger.info("Sending themes analysis request...")
-        themes_response = llm.invoke([HumanMessage(content=themes_prompt)])
+
         logger.info(f"Raw themes response: {themes_response.content}")
         themes_data = parse_json(themes_response.content)
-        logger.info(f"Themes: {themes_data.get('themes', [])}")
-        
-        return {
-            "sentiment": sentiment_data.get("sentiment", "neutral").lower(),
-            "confidence": float(sentiment_data.get("confidence", 0.5)),
-            "themes": themes_data.get("themes", [])[:5]  # Limit to 5 themes
-        }
-        
-    except Exception as e:
-        logger.error(f"Error analyzing {section_type}: {str(e)}")
-        return {
-            "sentiment": "neutral",
-            "confidence": 0.5,
-            "themes": []
-        }
+
+    logger.info(f"Sentiment: {sentiment_data.get('sentiment', 'neutral')} (Confidence: {sentiment_data.get('confidence', 0.5)})")
+    logger.info(f"Themes: {themes_data.get('themes', [])}")
+    
+    result = {
+        "sentiment": sentiment_data.get("sentiment", "neutral").lower(),
+        "confidence": float(sentiment_data.get("confidence", 0.5)),
+        "themes": string_themes(themes_data.get("themes", []))[:5]  # Limit to 5 themes
+    }
+    cache.set(cache_key, result)
+    return result
+
+def tone_scores(results):
+    """Signed management tone per quarter: confidence, negated for negative sentiment"""
+    confidence = np.array([r["management"]["confidence"] for r in results], dtype=float)
+    negative = np.array([r["management"]["sentiment"] == "negative" for r in results])
+    return np.where(negative, -confidence, confidence)
 
 def calculate_tone_changes(results):
+    """Set tone_change on every result after the first, relative to the one before it"""
     if len(results) < 2:
         return
     
     logger.info("Calculating tone changes between quarters")
-    
-    for i in range(1, len(results)):
-        current = results[i]["management"]
-        previous = results[i - 1]["management"]
-        
-        # Convert to numerical scores
-        current_score = current["confidence"] 
-        previous_score = previous["confidence"]
-        
-        if current["sentiment"] == "negative":
-            current_score *= -1
-        if previous["sentiment"] == "negative":
-            previous_score *= -1
-            
-        change = current_score - previous_score
-        results[i]["tone_change"] = round(change, 2)
-        logger.info(f"Tone change from {results[i-1]['quarter']} to {results[i]['quarter']}: {change:.2f}")
+    changes = np.round(np.diff(tone_scores(results)), 2)
+    for result, change in zip(results[1:], changes):
+        result["tone_change"] = float(change)
+    logger.info(f"Tone changes from {results[0]['quarter']} to {results[-1]['quarter']}: {changes.tolist()}")
 
 def parse_json(text):
     """Robust JSON parsing with multiple fallback strategies"""
@@ -206,16 +457,11 @@ def parse_json(text):
     return result
 
 def test_api_connection():
+    from langchain_core.messages import HumanMessage
+
     logger.info("Testing DeepSeek API connection...")
     try:
-        llm = ChatOpenAI(
-            model="deepseek-chat",
-            api_key=os.getenv("DEEPSEEK_API_KEY"),
-            base_url="https://api.deepseek.com/v1",
-            temperature=0.1,
-            max_retries=1,
-            request_timeout=30
-        )
+        llm = get_llm(max_retries=1, request_timeout=30)
         response = llm.invoke([HumanMessage(content="Return JSON: {'test': 'success'}")])
         logger.info(f"API test response: {response.content}")
         return "API connection successful"
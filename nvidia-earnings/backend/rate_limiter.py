@@ -0,0 +1,34 @@
+import threading
+import time
+
+class RateLimiter:
+    """Token bucket: calls average rate_per_minute, with bursts of up to burst calls at once.
+
+    A burst matching the caller's concurrency lets that many calls start together after
+    a quiet spell; once the bucket is empty, calls are spaced evenly again.
+    """
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, blocking=True):
+        """Take a token, sleeping until one is due; without blocking, False when none is available now"""
+        if not self.interval:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+            self._updated = now
+            if not blocking and tokens < 1:
+                self._tokens = tokens
+                return False
+            # A negative balance reserves a future token, so waiting callers keep their order
+            self._tokens = tokens - 1
+            wait = -self._tokens * self.interval
+        if wait > 0:
+            time.sleep(wait)
+        return True
@@ -0,0 +1,395 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import metrics
+from analysis_store import AnalysisStore, write_json_atomic
+from metrics import CACHE_REQUESTS, timed
+from nlp_analyzer import analyze_transcripts
+from theme_index import ThemeIndex
+from transcript_fetcher import DEFAULT_SYMBOL, company_name, get_transcripts
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = "analysis_cache.json"
+CACHE_TTL = 86400  # 24 hours in seconds
+# How often a worker checks the shared store for an analysis built by another worker
+STORE_POLL_SECONDS = float(os.getenv("ANALYSIS_STORE_POLL_SECONDS", "1"))
+
+class NoTranscriptsError(Exception):
+    pass
+
+def cache_file_for(symbol):
+    """NVDA keeps the original cache file name so existing caches are reused"""
+    return CACHE_FILE if symbol == DEFAULT_SYMBOL else f"analysis_cache_{symbol}.json"
+
+_store = None
+
+def get_analysis_store():
+    global _store
+    if _store is None:
+        _store = AnalysisStore()
+    return _store
+
+# Fields of an analysis result; transcript bodies are left out unless asked for
+FIELDS = ("quarter", "date", "management", "qa", "tone_change", "content")
+SUMMARY_FIELDS = tuple(field for field in FIELDS if field != "content")
+
+def project(result, fields=SUMMARY_FIELDS):
+    return {field: result[field] for field in fields if field in result}
+
+class EncodedBody:
+    """A JSON response body with its strong ETag and compressed variants"""
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.encodings = {"gzip": gzip.compress(self.body, compresslevel=6)}
+        if brotli is not None:
+            self.encodings["br"] = brotli.compress(self.body)
+
+    def encode_for(self, accept_encoding):
+        """Pick the smallest body the client accepts; returns (body, content_encoding)"""
+        accepted = {part.split(";")[0].strip() for part in (accept_encoding or "").lower().split(",")}
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.encodings:
+                return self.encodings[encoding], encoding
+        return self.body, None
+
+class AnalysisSnapshot:
+    """An analysis with its pre-encoded summary and theme trend responses and per-quarter transcript bodies"""
+
+    def __init__(self, analysis, built_at, trace_id=None, version=None, themes=None):
+        self.analysis = analysis
+        self.built_at = built_at
+        # Version in the shared store, identical in every worker serving this analysis
+        self.version = version
+        # Trace of the build that produced this snapshot, if it was built in this process
+        self.trace_id = trace_id
+        # The default response: everything the dashboard charts, without transcript text
+        self.summary = EncodedBody([project(result) for result in analysis])
+        self.etag = self.summary.etag
+        self.transcripts = [result.get("content", "").encode("utf-8") for result in analysis]
+        # Theme trends (ThemeIndex.series()); without a stored index, just this analysis' quarters
+        if themes is None:
+            index = ThemeIndex()
+            index.add_analysis(analysis)
+            themes = index.series()
+        self.themes = EncodedBody(themes)
+
+    def select(self, fields):
+        return [project(result, fields) for result in self.analysis]
+
+    def find(self, quarter):
+        """Index of the first result for a "Q1 2025" style quarter, or None"""
+        for index, result in enumerate(self.analysis):
+            if result.get("quarter", "").lower() == quarter.lower():
+                return index
+        return None
+
+def copy_outcome(source, target):
+    """Done callback resolving target with source's result or exception"""
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+def quarter_event(index, result):
+    return {"type": "quarter", "index": index, "data": project(result, [f for f in SUMMARY_FIELDS if f != "tone_change"])}
+
+def done_event(analysis):
+    """Final stream event: tone changes can only be computed once every quarter is in"""
+    return {
+        "type": "done",
+        "tone_changes": [
+            {"index": i, "quarter": result.get("quarter"), "tone_change": result["tone_change"]}
+            for i, result in enumerate(analysis) if "tone_change" in result
+        ]
+    }
+
+def snapshot_events(analysis):
+    yield {"type": "start", "total": len(analysis)}
+    for index, result in enumerate(analysis):
+        yield quarter_event(index, result)
+    yield done_event(analysis)
+
+class AnalysisRefresher:
+    """Serves the last good analysis and rebuilds it with at most one build in flight.
+
+    Analyses live in the shared AnalysisStore, so with several worker processes a
+    build lease lets exactly one of them rebuild a symbol while the others keep
+    serving, then pick up the new version. The JSON cache file is kept as an export.
+    """
+
+    def __init__(self, symbol=DEFAULT_SYMBOL, cache_file=None, ttl=CACHE_TTL, executor=None, schedule=None, store=None):
+        self.symbol = symbol
+        self.cache_file = cache_file or cache_file_for(symbol)
+        self.ttl = ttl
+        self.store = store or get_analysis_store()
+        self._synced_at = 0.0
+        # Called with this refresher to queue a rebuild instead of starting one, for stale
+        # and cold requests alike; cold requests then wait for the build it dispatches
+        self.schedule = schedule
+        self.snapshot = None
+        self._lock = threading.Lock()
+        self._inflight = None
+        # Resolved by the next build started, for requests waiting on a scheduled one
+        self._pending = None
+        self._pending_trace = None
+        # Trace of the latest build started, see /metrics/traces
+        self.trace_id = None
+        # Live progress of the in-flight build, replayed to streams that join late
+        self._events = []
+        self._listeners = []
+        # Builds may run on a pool shared with other symbols
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis-refresh")
+
+    def is_stale(self):
+        return self.snapshot is None or (time.time() - self.snapshot.built_at) >= self.ttl
+
+    def get(self):
+        return self.get_snapshot().analysis
+
+    def current(self):
+        """The latest stored snapshot, without building one"""
+        self._sync()
+        return self.snapshot
+
+    def get_snapshot(self, trace_id=None):
+        """Return the current snapshot, waiting only when none has ever been built"""
+        self._sync()
+
+        if self.snapshot is None:
+            logger.info("No cached analysis available, waiting for build")
+            CACHE_REQUESTS.inc(cache="analysis", result="miss")
+            return self.request_build(trace_id).result()
+
+        if self.is_stale():
+            logger.info("Serving stale analysis while refreshing in background")
+            CACHE_REQUESTS.inc(cache="analysis", result="stale")
+            self.request_build()
+        else:
+            CACHE_REQUESTS.inc(cache="analysis", result="hit")
+        return self.snapshot
+
+    def refresh(self, trace_id=None):
+        """Start a rebuild unless one is already running; returns the in-flight future.
+
+        A new build is traced under trace_id (generated when omitted); a running one keeps its own.
+        """
+        with self._lock:
+            if self._inflight is not None:
+                return self._inflight
+            self.trace_id = trace_id or self._pending_trace or metrics.new_trace_id()
+            logger.info(f"Starting {self.symbol} analysis rebuild (trace {self.trace_id})")
+            self._events = []
+            # A version stored by another worker after this point makes the rebuild unnecessary
+            seen = self.snapshot.version if self.snapshot else None
+            future = self._inflight = self._executor.submit(self._build, self.trace_id, seen)
+            pending, self._pending, self._pending_trace = self._pending, None, None
+        # Registered outside the lock: an already finished future runs the callback inline
+        future.add_done_callback(self._clear_inflight)
+        if pending is not None:
+            future.add_done_callback(lambda done: copy_outcome(done, pending))
+        return future
+
+    def request_build(self, trace_id=None):
+        """Future of the next build: queued through schedule when set, otherwise started now.
+
+        A build already running is returned as is; trace_id names a build this call starts.
+        """
+        if self.schedule is None:
+            return self.refresh(trace_id)
+        with self._lock:
+            if self._inflight is not None:
+                return self._inflight
+            if self._pending is None:
+                self._pending = Future()
+                self._pending_trace = trace_id
+                # Nothing is building, so progress left over is from an earlier build
+                self._events = []
+            pending = self._pending
+        self.schedule(self)
+        return pending
+
+    def stream(self):
+        """Yield analysis events: start, one quarter event per result, then done or error
+
+        A cached snapshot is replayed at once (triggering a background refresh when stale);
+        only a cold start follows the in-flight build as each quarter finishes.
+        """
+        self._sync()
+
+        snapshot = self.snapshot
+        if snapshot is not None:
+            if self.is_stale():
+                logger.info("Streaming stale analysis while refreshing in background")
+                self.request_build()
+            yield from snapshot_events(snapshot.analysis)
+            return
+
+        events = queue.Queue()
+        future = self.request_build()
+        with self._lock:
+            backlog = list(self._events)
+            self._listeners.append(events.put)
+        try:
+            for event in backlog:
+                yield event
+                if event["type"] in ("done", "error"):
+                    return
+            while True:
+                try:
+                    event = events.get(timeout=1)
+                except queue.Empty:
+                    # The build may have finished before this stream subscribed to it
+                    if future.done() and events.empty():
+                        if future.exception():
+                            yield {"type": "error", "message": str(future.exception())}
+                        else:
+                            yield from snapshot_events(future.result().analysis)
+                        return
+                    continue
+                yield event
+                if event["type"] in ("done", "error"):
+                    return
+        finally:
+            with self._lock:
+                self._listeners.remove(events.put)
+
+    def refreshing(self):
+        return self._inflight is not None
+
+    def _clear_inflight(self, future):
+        with self._lock:
+            if self._inflight is future:
+                self._inflight = None
+        if future.exception():
+            logger.error(f"{self.symbol} analysis rebuild failed: {future.exception()}")
+
+    def _publish(self, event):
+        with self._lock:
+            self._events.append(event)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(event)
+
+    def _build(self, trace_id, seen=None):
+        with metrics.trace(f"{self.symbol} rebuild", trace_id):
+            while not self.store.acquire_lease(self.symbol):
+                # Another worker is rebuilding: keep serving what we have, or wait for its result
+                if self.snapshot is not None:
+                    logger.info(f"{self.symbol} is being rebuilt by another worker")
+                    return self.snapshot
+                time.sleep(STORE_POLL_SECONDS)
+                self._sync(force=True)
+            try:
+                stored = self.store.version(self.symbol)
+                if stored and stored[0] != seen:
+                    logger.info(f"{self.symbol} was rebuilt by another worker meanwhile")
+                    self._sync(force=True)
+                    return self.snapshot
+                return self._build_traced(trace_id)
+            finally:
+                self.store.release_lease(self.symbol)
+
+    def _on_result(self, index, result):
+        # Each finished quarter renews the lease, so only a dead worker's lease expires
+        self.store.acquire_lease(self.symbol)
+        self._publish(quarter_event(index, result))
+
+    def _build_traced(self, trace_id):
+        try:
+            logger.info(f"Fetching fresh {self.symbol} transcripts...")
+            # Placeholder samples only for a symbol never built; later failures keep the current analysis
+            transcripts = get_transcripts(self.symbol, placeholder=self.store.version(self.symbol) is None)
+            logger.info(f"Fetched {len(transcripts)} transcripts")
+            if not transcripts:
+                raise NoTranscriptsError(f"No transcripts found for {self.symbol}")
+            self._publish({"type": "start", "total": len(transcripts)})
+
+            logger.info("Analyzing transcripts...")
+            analysis = analyze_transcripts(
+                transcripts,
+                on_result=self._on_result,
+                company=company_name(self.symbol)
+            )
+        except Exception as e:
+            self._publish({"type": "error", "message": str(e)})
+            raise
+
+        logger.info("Saving analysis to cache")
+        built_at = time.time()
+        # Saved before the analysis, so workers that see the new version also find its themes
+        themes = self._update_themes(analysis)
+        version = self.store.save(self.symbol, analysis, built_at)
+        try:
+            write_json_atomic(self.cache_file, analysis)
+        except OSError as e:
+            logger.warning(f"Could not export analysis to {self.cache_file}: {e}")
+
+        self._install(AnalysisSnapshot(analysis, built_at, trace_id, version, themes))
+        self._publish(done_event(analysis))
+        return self.snapshot
+
+    def _update_themes(self, analysis):
+        """Fold the analysis into the symbol's stored theme index; returns the index's trend series.
+
+        A failure here only costs the trends: the analysis is still saved, with no themes served.
+        """
+        try:
+            with timed("theme_index"):
+                index = ThemeIndex.from_dict(self.store.load_themes(self.symbol))
+                index.add_analysis(analysis)
+                self.store.save_themes(self.symbol, index.to_dict())
+                return index.series()
+        except Exception as e:
+            logger.warning(f"Could not update the {self.symbol} theme index: {e}")
+            return {"quarters": [], "themes": []}
+
+    def _sync(self, force=False):
+        """Pick up a newer version from the shared store, checking it at most every STORE_POLL_SECONDS.
+
+        Only the check and the final swap hold the lock; loading and encoding a new
+        version must not block refreshes, progress events or streams meanwhile.
+        """
+        with self._lock:
+            now = time.time()
+            if not force and self.snapshot is not None and now - self._synced_at < STORE_POLL_SECONDS:
+                return
+            self._synced_at = now
+            current = self.snapshot.version if self.snapshot else None
+
+        stored = self.store.version(self.symbol)
+        if stored is None and current is None:
+            # First run after upgrading: seed the store from the old JSON cache file
+            self.store.import_file(self.symbol, self.cache_file)
+            stored = self.store.version(self.symbol)
+        if stored is None or stored[0] == current:
+            return
+        logger.info(f"Loading {self.symbol} analysis version {stored[0]} from cache")
+        with timed("cache_load"):
+            loaded = self.store.load(self.symbol)
+            if not loaded:
+                return
+            version, built_at, analysis = loaded
+            stored_themes = self.store.load_themes(self.symbol)
+            themes = ThemeIndex.from_dict(stored_themes).series() if stored_themes else None
+            self._install(AnalysisSnapshot(analysis, built_at, version=version, themes=themes))
+
+    def _install(self, snapshot):
+        """Serve snapshot from now on, unless a newer version was installed meanwhile"""
+        with self._lock:
+            if self.snapshot is None or self.snapshot.version is None or snapshot.version >= self.snapshot.version:
+                self.snapshot = snapshot
@@ -0,0 +1,207 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from metrics import CIRCUIT_OPEN, CIRCUIT_REJECTIONS, HEDGED_REQUESTS, in_context
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open an endpoint's circuit
+CIRCUIT_FAILURES = max(1, int(os.getenv("CIRCUIT_FAILURES", "5")))
+# How long an open circuit rejects calls before letting a single probe through
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+# Recent successful call latencies kept per endpoint for the hedging threshold
+LATENCY_WINDOW = 200
+# Hedging waits for this many latencies, so the threshold is not set by a couple of calls
+MIN_HEDGE_SAMPLES = 10
+
+# Runs hedged calls; primaries block in here too, so it must outnumber the callers
+_hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+class CircuitOpenError(Exception):
+    pass
+
+class Gate:
+    """Admission to an endpoint: a cap on concurrent calls and a rate limiter (see rate_limiter.py)"""
+
+    def __init__(self, concurrency, rate_limiter):
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self.rate_limiter = rate_limiter
+
+    def enter(self, blocking=True):
+        """Wait for a token and a free slot; without blocking, False unless both are available now"""
+        if blocking:
+            self.rate_limiter.acquire()
+            self._slots.acquire()
+            return True
+        if not self._slots.acquire(blocking=False):
+            return False
+        if not self.rate_limiter.acquire(blocking=False):
+            self._slots.release()
+            return False
+        return True
+
+    def leave(self):
+        self._slots.release()
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """Exponential backoff with full jitter, so clients retrying together spread out"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class CircuitBreaker:
+    """Stops calling an endpoint after repeated failures, then probes it with one call at a time"""
+
+    def __init__(self, name, failures=CIRCUIT_FAILURES, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._consecutive = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        """Raise CircuitOpenError unless the call may go ahead"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_seconds and not self._probing:
+                # Half open: this call is the probe, every other one is still rejected
+                self._probing = True
+                return
+        CIRCUIT_REJECTIONS.inc(endpoint=self.name)
+        raise CircuitOpenError(f"Circuit for {self.name} is open after repeated failures")
+
+    def record_success(self):
+        with self._lock:
+            was_open = self._opened_at is not None
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+        if was_open:
+            logger.info(f"Circuit for {self.name} closed")
+            CIRCUIT_OPEN.set(0, endpoint=self.name)
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            opening = self._probing or (self._opened_at is None and self._consecutive >= self.failures)
+            if opening:
+                self._opened_at = time.monotonic()
+            self._probing = False
+        if opening:
+            logger.warning(f"Circuit for {self.name} opened after {self._consecutive} consecutive failures")
+            CIRCUIT_OPEN.set(1, endpoint=self.name)
+
+class LatencyTracker:
+    """Latencies of an endpoint's recent successful calls"""
+
+    def __init__(self, size=LATENCY_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p):
+        """The p-th percentile latency, or None before MIN_HEDGE_SAMPLES calls succeeded"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+class Endpoint:
+    """A remote endpoint called through a circuit breaker, optionally with hedged requests.
+
+    With hedge_percentile set, a call still running after that percentile of recent
+    latencies gets a duplicate, and whichever answers first wins. Only hedge idempotent
+    calls, and only where the duplicate load is acceptable.
+
+    Calls pass the gate, if any, before they are timed, so latencies (and the hedging
+    threshold) cover the remote call and not the wait for our own limits. A duplicate
+    is only sent when the gate admits it at once. Only errors for which is_failure is
+    true count towards opening the circuit; any other error means the endpoint answered.
+    """
+
+    def __init__(self, name, hedge_percentile=0, gate=None, is_failure=None):
+        self.name = name
+        self.hedge_percentile = hedge_percentile
+        self.gate = gate
+        self.is_failure = is_failure or (lambda error: True)
+        self.breaker = CircuitBreaker(name)
+        self.latencies = LatencyTracker()
+
+    def call(self, fn, *args, **kwargs):
+        self.breaker.before_call()
+        delay = self.latencies.percentile(self.hedge_percentile) if self.hedge_percentile else None
+        if self.gate is not None:
+            self.gate.enter()
+        try:
+            if delay is None:
+                result = self._attempt(fn, args, kwargs)
+            else:
+                result = self._hedged(fn, args, kwargs, delay)
+        except Exception as e:
+            if self.is_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def _attempt(self, fn, args, kwargs):
+        """Time one call that has already passed the gate, leaving the gate afterwards"""
+        try:
+            start = time.monotonic()
+            result = fn(*args, **kwargs)
+            self.latencies.add(time.monotonic() - start)
+            return result
+        finally:
+            if self.gate is not None:
+                self.gate.leave()
+
+    def _hedged(self, fn, args, kwargs, delay):
+        attempt = in_context(self._attempt)
+        primary = _hedge_pool.submit(attempt, fn, args, kwargs)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+
+        if self.gate is not None and not self.gate.enter(blocking=False):
+            # The duplicate would only queue behind our own limits, taking a slot from other calls
+            logger.info(f"{self.name} call slower than {delay:.2f}s, but no capacity for a hedged request")
+            return primary.result()
+        logger.info(f"{self.name} call slower than {delay:.2f}s, sending a hedged request")
+        hedge = _hedge_pool.submit(attempt, fn, args, kwargs)
+        pending = {primary: "primary", hedge: "hedge"}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                winner = pending.pop(future)
+                if future.exception() is None:
+                    HEDGED_REQUESTS.inc(endpoint=self.name, winner=winner)
+                    return future.result()
+        # Both failed: report the original call's error
+        return primary.result()
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+def get_endpoint(name, hedge_percentile=0, gate=None, is_failure=None):
+    """The shared Endpoint for name, created with these settings on first use"""
+    with _endpoints_lock:
+        if name not in _endpoints:
+            _endpoints[name] = Endpoint(name, hedge_percentile, gate, is_failure)
+        return _endpoints[name]
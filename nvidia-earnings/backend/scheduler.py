@@ -0,0 +1,261 @@
+import heapq
+import itertools
+import logging
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from refresh_coordinator import AnalysisRefresher, NoTranscriptsError
+from theme_index import quarter_key
+
+logger = logging.getLogger(__name__)
+
+# Analysis builds running at once across all symbols; scraping and LLM calls inside
+# them are further paced by the per-host and DeepSeek rate limiters
+BUILD_WORKERS = max(1, int(os.getenv("SCHEDULER_BUILD_WORKERS", "2")))
+# How often due symbols are looked for and queued priorities refreshed, in seconds
+TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "60"))
+
+# Priority weights: a never-built symbol outranks everything else
+NEVER_BUILT_PRIORITY = 100.0
+EARNINGS_WEIGHT = 3.0
+EARNINGS_DECAY_DAYS = 30.0
+REQUEST_WEIGHT = 1.0
+REQUEST_HALF_LIFE = 3600.0
+# Failed builds are retried after tick * 2**failures seconds, capped at this
+MAX_RETRY_SECONDS = 6 * 3600.0
+# Symbols tracked because they were requested stop being refreshed after this long without a request
+UNTRACK_SECONDS = float(os.getenv("SCHEDULER_UNTRACK_SECONDS", str(3 * 86400)))
+
+DATE_FORMATS = ("%Y-%m-%d", "%B %d, %Y", "%b %d, %Y")
+# "Wednesday, Aug. 27, 2025 at 5 p.m. ET" in the header paragraphs of a transcript
+CONTENT_DATE_RE = re.compile(r"\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?\s+(\d{1,2}),\s+(\d{4})")
+# How far into the content the header's call date is looked for
+CONTENT_DATE_CHARS = 1000
+
+def parse_date(text):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def call_date(result):
+    """When a call took place: its parsed date, else the date in its header paragraphs,
+    else the end of its quarter (no later than now), or None"""
+    date = parse_date(result.get("date"))
+    if date:
+        return date
+    match = CONTENT_DATE_RE.search((result.get("content") or "")[:CONTENT_DATE_CHARS])
+    if match:
+        date = parse_date(f"{match.group(1)} {match.group(2)}, {match.group(3)}")
+        if date:
+            return date
+    key = quarter_key(result.get("quarter"))
+    if len(key) == 2:
+        year, quarter = key
+        end = datetime(year + 1, 1, 1) if quarter == 4 else datetime(year, 3 * quarter + 1, 1)
+        return min(end, datetime.now())
+    return None
+
+def latest_earnings(analysis):
+    """Most recent call date found in an analysis, or None"""
+    dates = [d for d in (call_date(result) for result in analysis) if d]
+    return max(dates) if dates else None
+
+class RefreshScheduler:
+    """Refreshes many symbols through a priority queue on a shared, bounded build pool.
+
+    Symbols whose last earnings call is recent, or which clients asked for lately,
+    are refreshed first; stale and cold requests queue a refresh instead of starting one.
+    Symbols given at construction are kept fresh for good; any other symbol is tracked
+    only while it keeps being requested and until a build finds no transcripts for it.
+    """
+
+    def __init__(self, symbols=(), max_age=None, workers=BUILD_WORKERS, tick=TICK_SECONDS):
+        self.max_age = max_age
+        self.tick = tick
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-build")
+        self._slots = threading.BoundedSemaphore(workers)
+        self._refreshers = {}
+        self._pinned = set(symbols)
+        self._heat = {}
+        self._failures = {}
+        self._queue = []
+        self._queued = set()
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._threads = []
+        for symbol in symbols:
+            self.refresher(symbol)
+
+    def refresher(self, symbol):
+        """The symbol's refresher, created (and tracked from then on) on first use"""
+        with self._cond:
+            if symbol not in self._refreshers:
+                self._refreshers[symbol] = AnalysisRefresher(symbol, executor=self._executor, schedule=self.schedule)
+            return self._refreshers[symbol]
+
+    def schedule(self, refresher):
+        """Queue a refresh for a refresher, on behalf of its stale or cold requests"""
+        if not self._threads:
+            # Not started (e.g. served without the app's lifespan): nothing would dispatch the queue
+            refresher.refresh()
+            return
+        with self._cond:
+            # A request may still hold a refresher untracked a moment ago
+            self._refreshers.setdefault(refresher.symbol, refresher)
+        self.enqueue(refresher.symbol)
+
+    def untrack(self, symbol, reason):
+        """Stop refreshing a requested symbol, unless it is pinned, queued or building"""
+        with self._cond:
+            refresher = self._refreshers.get(symbol)
+            if refresher is None or symbol in self._pinned or symbol in self._queued or refresher.refreshing():
+                return
+            del self._refreshers[symbol]
+            self._heat.pop(symbol, None)
+            self._failures.pop(symbol, None)
+        logger.info(f"No longer refreshing {symbol}: {reason}")
+
+    def untrack_idle(self):
+        now = time.time()
+        with self._cond:
+            idle = [
+                symbol for symbol in self._refreshers
+                if now - self._heat.get(symbol, (0.0, 0.0))[1] >= UNTRACK_SECONDS
+            ]
+        for symbol in idle:
+            self.untrack(symbol, f"not requested for {UNTRACK_SECONDS / 3600:.0f}h")
+
+    def symbols(self):
+        with self._cond:
+            return list(self._refreshers)
+
+    def record_request(self, symbol):
+        """Count a client request towards the symbol's exponentially decaying request heat"""
+        now = time.time()
+        with self._cond:
+            self._heat[symbol] = self._current_heat(symbol, now) + 1.0, now
+
+    def _current_heat(self, symbol, now):
+        heat, updated = self._heat.get(symbol, (0.0, now))
+        return heat * 0.5 ** ((now - updated) / REQUEST_HALF_LIFE)
+
+    def priority(self, symbol):
+        refresher = self.refresher(symbol)
+        snapshot = refresher.current()
+        if snapshot is None:
+            return NEVER_BUILT_PRIORITY
+
+        score = REQUEST_WEIGHT * math.log1p(self._current_heat(symbol, time.time()))
+        latest = latest_earnings(snapshot.analysis)
+        if latest:
+            days = max(0.0, (datetime.now() - latest).total_seconds() / 86400)
+            score += EARNINGS_WEIGHT * math.exp(-days / EARNINGS_DECAY_DAYS)
+        # Older snapshots drift upwards so every symbol is eventually refreshed
+        return score + (time.time() - snapshot.built_at) / refresher.ttl
+
+    def is_due(self, symbol):
+        failures, failed_at = self._failures.get(symbol, (0, 0.0))
+        if failures and time.time() - failed_at < min(MAX_RETRY_SECONDS, self.tick * 2 ** failures):
+            return False
+        snapshot = self.refresher(symbol).current()
+        if snapshot is None or self.refresher(symbol).is_stale():
+            return True
+        return self.max_age is not None and time.time() - snapshot.built_at >= self.max_age
+
+    def enqueue(self, symbol):
+        """Queue a refresh unless one is already queued or running"""
+        priority = self.priority(symbol)
+        with self._cond:
+            refresher = self._refreshers.get(symbol)
+            if refresher is None or symbol in self._queued or refresher.refreshing():
+                return
+            self._queued.add(symbol)
+            heapq.heappush(self._queue, (-priority, next(self._counter), symbol))
+            self._cond.notify()
+
+    def enqueue_due(self):
+        """Drop idle requested symbols, queue every due symbol and re-rank what is already waiting"""
+        self.untrack_idle()
+        for symbol in self.symbols():
+            if self.is_due(symbol):
+                self.enqueue(symbol)
+        with self._cond:
+            waiting = [symbol for _, _, symbol in self._queue]
+        ranked = [(-self.priority(symbol), next(self._counter), symbol) for symbol in waiting]
+        with self._cond:
+            # Entries dispatched meanwhile are dropped, entries queued meanwhile are kept as they are
+            still_waiting = {symbol for _, _, symbol in self._queue}
+            self._queue = [entry for entry in ranked if entry[2] in still_waiting] + \
+                [entry for entry in self._queue if entry[2] not in waiting]
+            heapq.heapify(self._queue)
+
+    def prewarm(self):
+        """Load every tracked symbol's last good analysis into memory, without building any"""
+        for symbol in self.symbols():
+            try:
+                self.refresher(symbol).current()
+            except Exception as e:
+                logger.error(f"Could not prewarm {symbol} analysis: {e}")
+
+    def start(self):
+        for target in (self._dispatch, self._tick):
+            thread = threading.Thread(target=target, daemon=True, name=f"scheduler-{target.__name__.strip('_')}")
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _tick(self):
+        while not self._stopped.is_set():
+            try:
+                self.enqueue_due()
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {e}")
+            self._stopped.wait(self.tick)
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped.is_set():
+                    self._cond.wait()
+                if self._stopped.is_set():
+                    return
+                _, _, symbol = heapq.heappop(self._queue)
+
+            # Wait for a free build slot so hundreds of due symbols never start at once
+            self._slots.acquire()
+            with self._cond:
+                self._queued.discard(symbol)
+                refresher = self._refreshers[symbol]
+            logger.info(f"Scheduled refresh of {symbol}")
+            try:
+                future = refresher.refresh()
+            except Exception as e:
+                logger.error(f"Could not start refresh of {symbol}: {e}")
+                self._slots.release()
+                continue
+            future.add_done_callback(lambda done, symbol=symbol: self._finished(symbol, done))
+
+    def _finished(self, symbol, future):
+        self._slots.release()
+        with self._cond:
+            if future.exception() is None:
+                self._failures.pop(symbol, None)
+            else:
+                failures, _ = self._failures.get(symbol, (0, 0.0))
+                self._failures[symbol] = failures + 1, time.time()
+        # Most likely a typo or a ticker fool.com does not cover
+        if isinstance(future.exception(), NoTranscriptsError):
+            self.untrack(symbol, "no transcripts found")
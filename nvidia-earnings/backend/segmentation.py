@@ -0,0 +1,111 @@
+import re
+
+# Paragraphs dropped before segmentation: site boilerplate and stock ticker noise
+NOISE_RE = re.compile(r"motley fool|copyright|transcript", re.IGNORECASE)
+TICKER_RE = re.compile(r"^[A-Z]{1,5}\d*\.?\d*%?$")
+
+# "Colette Kress -- Executive Vice President and Chief Financial Officer"
+# (get_text(strip=True) drops the spaces around the dashes, so they are optional)
+SPEAKER_RE = re.compile(r"^(?P<name>[A-Z][\w.'’-]*(?:\s+[A-Z][\w.'’-]*){0,4})\s*(?:--|—|–)\s*(?P<title>.{2,120})$")
+OPERATOR_RE = re.compile(r"^operator\s*(?::\s*(?P<text>.*))?$", re.IGNORECASE | re.DOTALL)
+PREPARED_HEADING_RE = re.compile(r"^prepared remarks\s*:?$", re.IGNORECASE)
+QA_HEADING_RE = re.compile(r"^(?:questions?\s*(?:&|and)\s*answers?|q\s*&\s*a)(?:\s+session)?\s*:?$", re.IGNORECASE)
+QA_MENTION_RE = re.compile(r"question.{1,10}answer|q\.?\s*&\.?\s*a\b|questions?\s+and\s+answers?", re.IGNORECASE)
+# Start of the closing participants list ("Duration: 0 minutes" precedes it on fool.com)
+PARTICIPANTS_RE = re.compile(r"^(?:call participants\s*:?|duration:.*)$", re.IGNORECASE)
+
+MANAGEMENT, QA = "management", "qa"
+EXECUTIVE, ANALYST, OPERATOR = "executive", "analyst", "operator"
+# Text outside any recognised speaker turn, e.g. pages without speaker headers
+UNATTRIBUTED = "unattributed"
+
+def segment(paragraphs):
+    """Single pass over cleaned paragraphs: returns (content, turns).
+
+    content is the paragraphs joined by newlines; each turn is
+    {"speaker", "role", "section", "start", "end"} with offsets into content.
+    Q&A starts at a Q&A heading, at an operator turn announcing questions, or
+    at the first analyst turn, never at a bare mention of "operator".
+    """
+    kept = []
+    turns = []
+    turn = None
+    section = MANAGEMENT
+    offset = 0
+    saw_speaker = False
+    in_participants = False
+
+    def start_turn(speaker, role):
+        nonlocal turn
+        turn = {"speaker": speaker, "role": role, "section": section, "start": None, "end": None}
+        turns.append(turn)
+
+    for text in paragraphs:
+        if not text or NOISE_RE.search(text) or TICKER_RE.match(text):
+            continue
+        start = offset
+        kept.append(text)
+        offset += len(text) + 1
+
+        if in_participants or PARTICIPANTS_RE.match(text):
+            # Closing list of names and titles, not speech
+            in_participants = True
+            turn = None
+            continue
+        if PREPARED_HEADING_RE.match(text):
+            turn = None
+            continue
+        if QA_HEADING_RE.match(text):
+            section = QA
+            turn = None
+            continue
+
+        speaker = SPEAKER_RE.match(text)
+        operator = OPERATOR_RE.match(text)
+        if speaker:
+            saw_speaker = True
+            role = ANALYST if "analyst" in speaker.group("title").lower() else EXECUTIVE
+            if role == ANALYST and section == MANAGEMENT:
+                section = QA
+                # The operator introducing the first question belongs to the Q&A
+                if turns and turns[-1]["role"] == OPERATOR:
+                    turns[-1]["section"] = QA
+            start_turn(speaker.group("name"), role)
+            continue
+        if operator:
+            saw_speaker = True
+            start_turn("Operator", OPERATOR)
+            if not operator.group("text"):
+                continue
+            start += len(text) - len(operator.group("text"))
+        elif turn is None or (not saw_speaker and section == MANAGEMENT and QA_MENTION_RE.search(text)):
+            # Without speaker headers, a later paragraph mentioning Q&A opens that section
+            if turn is not None:
+                section = QA
+            start_turn(None, UNATTRIBUTED)
+
+        if turn["role"] == OPERATOR and section == MANAGEMENT and QA_MENTION_RE.search(text) \
+                and any(t["role"] == EXECUTIVE for t in turns):
+            section = turn["section"] = QA
+        if turn["start"] is None:
+            turn["start"] = start
+        turn["end"] = offset - 1
+
+    content = "\n".join(kept)
+    return content, [t for t in turns if t["start"] is not None]
+
+def section_text(record, section, roles=None):
+    """Text of one section, optionally restricted to speaker roles, read from the turn index.
+
+    Records without an index (hardcoded fallbacks, older stored records) carry the
+    section as a plain string instead.
+    """
+    turns = record.get("turns")
+    if turns is None:
+        return record.get(section, "")
+    content = record.get("content", "")
+    return "\n".join(
+        content[turn["start"]:turn["end"]]
+        for turn in turns
+        if turn["section"] == section and (roles is None or turn["role"] in roles)
+    )
@@ -0,0 +1,201 @@
+"""Local stand-ins for fool.com and the DeepSeek API, for offline benchmarks and manual testing.
+
+    python stand_ins.py --latency 0.3 --error-rate 0.05
+
+serves both until interrupted. Point the backend at them with
+FOOL_SITE_ROOT=http://127.0.0.1:<site port> and DEEPSEEK_BASE_URL=http://127.0.0.1:<llm port>/v1.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+# Saved transcript pages served in turn, newest first
+TRANSCRIPT_PAGES = [
+    "debug_transcript_1.html",
+    "debug_transcript_2.html",
+    "debug_transcript_3.html",
+]
+
+LISTING_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>Earnings Call Transcripts</title></head><body>
+<h1>{symbol} Earnings Call Transcripts</h1>
+{cards}
+</body></html>
+"""
+CARD_TEMPLATE = """<div class="card"><a href="/earnings/call-transcripts/{slug}/">{name} ({symbol}) Q{quarter} Earnings Call Transcript</a></div>"""
+
+THEMES = ["Data Center", "Generative AI", "Blackwell Platform", "Networking", "Sovereign AI", "AI Inference"]
+
+class StandInServer:
+    """A ThreadingHTTPServer on a free local port, served from a daemon thread"""
+
+    def __init__(self, handler):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+class QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+def fool_site(pages, latency=0.0, slow_rate=0.0, slow_latency=2.0, seed=None):
+    """Stand-in for fool.com: a listing page per symbol and the saved transcript pages, with ETags.
+
+    pages is a list of raw transcript page bodies; each symbol's listing links to all of them.
+    A share of slow_rate requests takes slow_latency seconds instead of latency, as a tail.
+    """
+    etags = [f'"{hashlib.sha256(page).hexdigest()[:16]}"' for page in pages]
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class FoolHandler(QuietHandler):
+        def do_GET(self):
+            with rng_lock:
+                slow = rng.random() < slow_rate
+            time.sleep(slow_latency if slow else latency)
+            url = urlparse(self.path)
+            if url.path.rstrip("/") == "/earnings-call-transcripts":
+                symbol = parse_qs(url.query).get("symbol", ["NVDA"])[0].upper()
+                name = "NVIDIA" if symbol == "NVDA" else symbol
+                cards = "\n".join(
+                    CARD_TEMPLATE.format(slug=f"{symbol.lower()}-{index}", name=name, symbol=symbol, quarter=4 - index % 4)
+                    for index in range(len(pages))
+                )
+                body = LISTING_TEMPLATE.format(symbol=symbol, cards=cards).encode("utf-8")
+                return self.send_body(200, body, "text/html; charset=utf-8")
+
+            match = re.match(r"^/earnings/call-transcripts/[\w.-]+-(\d+)/?$", url.path)
+            if not match or int(match.group(1)) >= len(pages):
+                return self.send_body(404, b"Not found", "text/plain")
+            index = int(match.group(1))
+            headers = {"ETag": etags[index]}
+            if self.headers.get("If-None-Match") == etags[index]:
+                self.send_response(304)
+                self.send_header("ETag", etags[index])
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_body(200, pages[index], "text/html; charset=utf-8", headers)
+
+    return StandInServer(FoolHandler)
+
+def fake_llm(latency=0.0, error_rate=0.0, seed=None):
+    """Stand-in for an OpenAI-compatible chat completions API (DeepSeek).
+
+    Every request waits latency seconds; a share of error_rate fails with a 429 (with
+    Retry-After: 0) or a 500, alternately. Answers are deterministic for a given prompt.
+    """
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    counters = {"requests": 0, "errors": 0}
+
+    class LLMHandler(QuietHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(latency)
+            with rng_lock:
+                counters["requests"] += 1
+                fail = rng.random() < error_rate
+                if fail:
+                    counters["errors"] += 1
+                    rate_limited = counters["errors"] % 2 == 1
+            if fail:
+                error = {"error": {"message": "stand-in failure", "type": "rate_limit" if rate_limited else "server_error"}}
+                headers = {"Retry-After": "0"} if rate_limited else {}
+                return self.send_body(429 if rate_limited else 500, json.dumps(error).encode(), "application/json", headers)
+
+            prompt = " ".join(message.get("content", "") for message in request.get("messages", []))
+            content = json.dumps(answer(prompt))
+            prompt_tokens = max(1, len(prompt) // 4)
+            completion_tokens = max(1, len(content) // 4)
+            body = {
+                "id": f"chatcmpl-{counters['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "deepseek-chat"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+            self.send_body(200, json.dumps(body).encode(), "application/json")
+
+    server = StandInServer(LLMHandler)
+    server.counters = counters
+    return server
+
+def answer(prompt):
+    """A plausible, deterministic analysis for the fields the prompt's JSON format asks for"""
+    digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    result = {}
+    if '"sentiment"' in prompt:
+        result["sentiment"] = ("positive", "positive", "neutral", "negative")[digest % 4]
+        result["confidence"] = round(0.6 + (digest % 35) / 100, 2)
+    if '"themes"' in prompt:
+        result["themes"] = [THEMES[(digest >> shift) % len(THEMES)] for shift in (0, 8, 16)]
+    return result
+
+def load_pages(paths=TRANSCRIPT_PAGES):
+    pages = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    return pages
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for fool.com and the DeepSeek API")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every LLM request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of LLM requests that fail (0-1)")
+    parser.add_argument("--site-latency", type=float, default=0.0, help="seconds added to every page request")
+    parser.add_argument("--site-slow-rate", type=float, default=0.0, help="share of page requests that take 2s instead")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    with fool_site(load_pages(), args.site_latency, args.site_slow_rate) as site, fake_llm(args.latency, args.error_rate) as llm:
+        logger.info(f"FOOL_SITE_ROOT={site.url}")
+        logger.info(f"DEEPSEEK_BASE_URL={llm.url}/v1")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
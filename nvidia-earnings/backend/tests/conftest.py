@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Backend modules import each other by module name, as when run from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Tests never download the tokenizer encoding; token counts are estimated without it
+os.environ.setdefault("TIKTOKEN_DOWNLOAD", "0")
@@ -0,0 +1,34 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+
+class FakeRefresher:
+    trace_id = "trace"
+
+    def refresh(self, trace_id=None):
+        pass
+
+@pytest.fixture
+def client(monkeypatch):
+    started = []
+    monkeypatch.setattr(app.scheduler, "refresher", lambda symbol: started.append(symbol) or FakeRefresher())
+    client = TestClient(app.app)
+    client.started = started
+    return client
+
+def test_admin_refresh_is_closed_without_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(app, "ADMIN_TOKEN", None)
+    assert client.post("/api/admin/refresh").status_code == 403
+    assert client.post("/api/admin/refresh", headers={"X-Admin-Token": ""}).status_code == 403
+    assert client.started == []
+
+def test_admin_refresh_checks_the_token(client, monkeypatch):
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "secret")
+    assert client.post("/api/admin/refresh").status_code == 403
+    assert client.post("/api/admin/refresh", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.started == []
+
+    response = client.post("/api/admin/refresh?symbol=amd", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert client.started == ["AMD"]
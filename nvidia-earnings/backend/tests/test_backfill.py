@@ -0,0 +1,32 @@
+import csv
+import json
+
+from backfill import drop_partial_line, load_done, write_tone_history
+
+def row(quarter, content_hash, sentiment="positive"):
+    result = {"sentiment": sentiment, "confidence": 0.9, "themes": []}
+    return json.dumps({
+        "ticker": "NVDA", "source": "page.html", "content_hash": content_hash,
+        "quarter": quarter, "date": "Unknown Date", "management": result, "qa": result,
+    }) + "\n"
+
+def test_interrupted_output_is_truncated_before_appending(tmp_path):
+    output = tmp_path / "history.jsonl"
+    output.write_text(row("Q1 2025", "a") + row("Q2 2025", "b")[:40])
+
+    drop_partial_line(str(output))
+    with open(output, "a") as f:
+        f.write(row("Q2 2025", "b"))
+
+    assert load_done(str(output)) == {"a", "b"}
+    assert output.read_text() == row("Q1 2025", "a") + row("Q2 2025", "b")
+
+def test_tone_history_skips_unreadable_lines(tmp_path):
+    output = tmp_path / "history.jsonl"
+    output.write_text(row("Q1 2025", "a") + '{"ticker": "NV' + "\n" + row("Q2 2025", "b", "negative"))
+    path = tmp_path / "history_tone.csv"
+
+    write_tone_history(str(output), str(path))
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert [r["quarter"] for r in rows] == ["Q1 2025", "Q2 2025"]
@@ -0,0 +1,21 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+def test_in_context_runs_in_several_threads_at_once():
+    workers = 4
+    # Every call waits for the others, so the wrapped function is guaranteed to run concurrently
+    barrier = threading.Barrier(workers, timeout=5)
+
+    def stage(item):
+        with metrics.timed("test_stage"):
+            barrier.wait()
+        return item, metrics.current_trace_id()
+
+    with metrics.trace("test") as current:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(metrics.in_context(stage), range(workers * 2)))
+
+    assert results == [(item, current.trace_id) for item in range(workers * 2)]
+    assert current.summary()["stages"]["test_stage"]["count"] == workers * 2
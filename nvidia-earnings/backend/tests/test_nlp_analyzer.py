@@ -0,0 +1,15 @@
+import nlp_analyzer
+
+TEXT = "Revenue was a record and demand for our data center platform remains strong. " * 4
+
+def test_llm_tier_falls_back_to_local_score_when_llm_fails(monkeypatch):
+    def fail(*args):
+        raise RuntimeError("circuit open")
+
+    monkeypatch.setattr(nlp_analyzer, "request_analysis", fail)
+    monkeypatch.setattr(nlp_analyzer, "sentiment_tier", lambda: "llm")
+    local = nlp_analyzer.score_sections([TEXT])[0]
+
+    results = nlp_analyzer.analyze_transcripts([{"quarter": "Q1 2025", "management": TEXT, "qa": ""}])
+    assert results[0]["management"]["sentiment"] == local["sentiment"]
+    assert results[0]["management"]["confidence"] == local["confidence"]
@@ -0,0 +1,29 @@
+import threading
+from concurrent.futures import Future
+
+from analysis_store import AnalysisStore
+from refresh_coordinator import AnalysisRefresher
+
+class FinishedExecutor:
+    """Runs submitted work at once, so the future is already done when refresh() registers its callback"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+def test_refresh_with_already_finished_build_does_not_deadlock(tmp_path):
+    refresher = AnalysisRefresher(
+        "TEST", cache_file=str(tmp_path / "cache.json"), executor=FinishedExecutor(),
+        store=AnalysisStore(str(tmp_path / "analysis.db")),
+    )
+    refresher._build = lambda trace_id, seen: "snapshot"
+
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(future=refresher.refresh()), daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive(), "refresh() deadlocked on its own lock"
+    assert result["future"].result() == "snapshot"
+    assert not refresher.refreshing()
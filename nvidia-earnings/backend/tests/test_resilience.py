@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+from rate_limiter import RateLimiter
+from resilience import CircuitBreaker, CircuitOpenError, Endpoint, Gate, LatencyTracker
+
+class TransientError(Exception):
+    pass
+
+class PermanentError(Exception):
+    pass
+
+def fail(error):
+    raise error
+
+def warmed_endpoint(gate=None, samples=20, seconds=0.01):
+    """An endpoint hedging at p50, with enough fast latencies recorded to hedge right away"""
+    endpoint = Endpoint("test", hedge_percentile=50, gate=gate, is_failure=lambda e: isinstance(e, TransientError))
+    for _ in range(samples):
+        endpoint.latencies.add(seconds)
+    return endpoint
+
+def test_breaker_opens_rejects_probes_and_closes():
+    breaker = CircuitBreaker("test", failures=2, reset_seconds=0.05)
+    breaker.before_call()
+    breaker.record_failure()
+    assert not breaker.is_open()
+    breaker.record_failure()
+    assert breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    # Half open: a single probe goes through, every other call is still rejected
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert not breaker.is_open()
+    breaker.before_call()
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker("test", failures=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_latency_percentile_needs_enough_samples():
+    tracker = LatencyTracker()
+    for seconds in range(1, 10):
+        tracker.add(seconds)
+    assert tracker.percentile(50) is None
+    tracker.add(10)
+    assert tracker.percentile(50) == 6
+    assert tracker.percentile(100) == 10
+
+def test_only_transient_errors_open_the_circuit():
+    endpoint = Endpoint("test", is_failure=lambda e: isinstance(e, TransientError))
+    endpoint.breaker.failures = 2
+    for _ in range(5):
+        with pytest.raises(PermanentError):
+            endpoint.call(fail, PermanentError())
+    assert not endpoint.breaker.is_open()
+
+    for _ in range(2):
+        with pytest.raises(TransientError):
+            endpoint.call(fail, TransientError())
+    assert endpoint.breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        endpoint.call(lambda: "unreached")
+
+def test_hedge_wins_over_slow_primary():
+    endpoint = warmed_endpoint()
+    calls = []
+    lock = threading.Lock()
+
+    def request():
+        with lock:
+            calls.append(None)
+            first = len(calls) == 1
+        if first:
+            time.sleep(1)
+            return "primary"
+        return "hedge"
+
+    start = time.monotonic()
+    assert endpoint.call(request) == "hedge"
+    assert time.monotonic() - start < 0.5
+    assert len(calls) == 2
+
+def test_both_attempts_failing_raises_the_primary_error():
+    endpoint = warmed_endpoint()
+    calls = []
+    lock = threading.Lock()
+
+    def request():
+        with lock:
+            calls.append(None)
+            number = len(calls)
+        time.sleep(0.1)
+        raise TransientError(f"attempt {number}")
+
+    with pytest.raises(TransientError, match="attempt 1"):
+        endpoint.call(request)
+    assert len(calls) == 2
+
+def test_no_hedge_without_free_gate_capacity():
+    endpoint = warmed_endpoint(gate=Gate(1, RateLimiter(0)))
+    calls = []
+
+    def request():
+        calls.append(None)
+        time.sleep(0.1)
+        return "primary"
+
+    assert endpoint.call(request) == "primary"
+    assert len(calls) == 1
+    # The slot is given back once the call is done
+    assert endpoint.gate.enter(blocking=False)
+
+def test_gate_wait_is_not_counted_as_latency():
+    # One token per 0.1s: every call after the first waits for the limiter before it is timed
+    endpoint = Endpoint("test", gate=Gate(4, RateLimiter(600)))
+    for _ in range(10):
+        endpoint.call(lambda: None)
+    assert endpoint.latencies.percentile(100) < 0.05
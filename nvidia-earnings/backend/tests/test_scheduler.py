@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from scheduler import latest_earnings
+
+def test_latest_earnings_reads_the_header_date_when_date_is_unknown():
+    analysis = [
+        {"quarter": "Q1 2025", "date": "Unknown Date", "content": "NVIDIA (NVDA) Q1 2025 Earnings Call\nMay 22, 2024, 5:00 p.m. ET"},
+        {"quarter": "Q2 2025", "date": "Unknown Date", "content": "DATE\nWednesday, Aug. 28, 2024 at 5 p.m. ET"},
+    ]
+    assert latest_earnings(analysis) == datetime(2024, 8, 28)
+
+def test_latest_earnings_falls_back_to_the_quarter():
+    analysis = [
+        {"quarter": "Q1 2024", "date": "Unknown Date", "content": ""},
+        {"quarter": "Q3 2024", "date": "Unknown Date", "content": ""},
+    ]
+    assert latest_earnings(analysis) == datetime(2024, 10, 1)
+    assert latest_earnings([{"quarter": "Unknown Quarter", "date": "Unknown Date"}]) is None
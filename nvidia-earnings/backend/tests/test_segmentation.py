@@ -0,0 +1,68 @@
+from segmentation import ANALYST, EXECUTIVE, MANAGEMENT, OPERATOR, QA, section_text, segment
+
+def sections(paragraphs):
+    content, turns = segment(paragraphs)
+    return {
+        section: [content[t["start"]:t["end"]] for t in turns if t["section"] == section]
+        for section in (MANAGEMENT, QA)
+    }, turns
+
+def test_qa_heading_opens_qa():
+    result, _ = sections([
+        "Jensen Huang -- Chief Executive Officer",
+        "Demand for Blackwell is incredible.",
+        "Questions & Answers:",
+        "Jensen Huang -- Chief Executive Officer",
+        "We are ramping as fast as we can.",
+    ])
+    assert result[MANAGEMENT] == ["Demand for Blackwell is incredible."]
+    assert result[QA] == ["We are ramping as fast as we can."]
+
+def test_operator_announcing_questions_opens_qa():
+    result, turns = sections([
+        "Operator",
+        "Good afternoon and welcome.",
+        "Colette Kress -- Executive Vice President and Chief Financial Officer",
+        "Revenue was a record.",
+        "Operator",
+        "We will now open the call for questions and answers.",
+        "Jensen Huang -- Chief Executive Officer",
+        "Inference is growing quickly.",
+    ])
+    assert result[MANAGEMENT] == ["Good afternoon and welcome.", "Revenue was a record."]
+    assert result[QA] == [
+        "We will now open the call for questions and answers.",
+        "Inference is growing quickly.",
+    ]
+    assert [t["role"] for t in turns] == [OPERATOR, EXECUTIVE, OPERATOR, EXECUTIVE]
+
+def test_first_analyst_turn_opens_qa():
+    result, turns = sections([
+        "Colette Kress -- Executive Vice President and Chief Financial Officer",
+        "Data center revenue grew.",
+        "Operator",
+        "Your first question comes from Vivek Arya.",
+        "Vivek Arya -- Bank of America Merrill Lynch -- Analyst",
+        "How should we think about gross margins?",
+        "Colette Kress -- Executive Vice President and Chief Financial Officer",
+        "We expect them to stay in the mid-70s.",
+    ])
+    assert result[MANAGEMENT] == ["Data center revenue grew."]
+    # The operator introducing the first question moves into the Q&A with it
+    assert result[QA] == [
+        "Your first question comes from Vivek Arya.",
+        "How should we think about gross margins?",
+        "We expect them to stay in the mid-70s.",
+    ]
+    assert [t["role"] for t in turns if t["section"] == QA] == [OPERATOR, ANALYST, EXECUTIVE]
+
+def test_bare_operator_mention_stays_in_prepared_remarks():
+    content, turns = segment([
+        "Jensen Huang -- Chief Executive Officer",
+        "Operator margins at our cloud partners keep improving.",
+        "We see questions and answers from customers every day.",
+    ])
+    record = {"content": content, "turns": turns}
+    assert [t["role"] for t in turns] == [EXECUTIVE]
+    assert section_text(record, QA) == ""
+    assert "Operator margins" in section_text(record, MANAGEMENT)
@@ -0,0 +1,26 @@
+from theme_index import ThemeIndex
+
+def result(quarter, themes):
+    section = {"sentiment": "positive", "confidence": 0.9, "themes": themes}
+    return {"quarter": quarter, "date": "Unknown Date", "management": section, "qa": {}}
+
+def variants(index, theme):
+    return next(c["variants"] for c in index.clusters if theme in c["variants"])
+
+def test_reindexing_a_quarter_does_not_inflate_variant_counts():
+    index = ThemeIndex()
+    index.add_analysis([result("Q1 2025", ["Quantum annealing"]), result("Q2 2025", ["Quantum annealers"])])
+    counts = dict(variants(index, "Quantum annealing"))
+
+    for _ in range(3):
+        index = ThemeIndex.from_dict(index.to_dict())
+        index.add_analysis([result("Q2 2025", ["Quantum annealers"])])
+    assert variants(index, "Quantum annealing") == counts
+
+def test_replaced_quarter_takes_its_variants_off_the_counts():
+    index = ThemeIndex()
+    index.add_analysis([result("Q1 2025", ["Quantum annealing"]), result("Q2 2025", ["Quantum annealers"])])
+    index.add_analysis([result("Q2 2025", ["Quantum annealing"])])
+    found = variants(index, "Quantum annealing")
+    assert found["Quantum annealing"] == 2
+    assert found.get("Quantum annealers", 0) == 0
@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+import transcript_fetcher
+from transcript_store import TranscriptStore
+
+class Response:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+def test_adds_parser_version_to_older_databases(tmp_path):
+    path = str(tmp_path / "transcripts.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE transcripts (url TEXT PRIMARY KEY, content_hash TEXT NOT NULL, html BLOB NOT NULL, "
+            "record TEXT NOT NULL, etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO transcripts VALUES ('u', 'h', x'00', '{\"quarter\": \"Q1 2025\"}', NULL, NULL, 0)"
+        )
+    entry = TranscriptStore(path).get("u")
+    assert entry["parser_version"] == 1
+    assert entry["record"] == {"quarter": "Q1 2025"}
+
+def test_not_modified_reparses_records_from_older_parser(tmp_path, monkeypatch):
+    store = TranscriptStore(str(tmp_path / "transcripts.db"))
+    store.save("u", b"<html>page</html>", {"quarter": "old"}, etag='"1"', parser_version=1)
+    parsed = []
+
+    def parse(html, url):
+        parsed.append(html)
+        return {"quarter": "new", "content": "", "turns": []}
+
+    monkeypatch.setattr(transcript_fetcher, "parse_transcript_page", parse)
+    response = Response(304)
+
+    record = transcript_fetcher.transcript_record(response, "u", store.get("u"), store, "TEST", 0)
+    assert record["quarter"] == "new"
+    assert parsed == [b"<html>page</html>"]
+    assert store.get("u")["parser_version"] == transcript_fetcher.PARSER_VERSION
+    assert store.get("u")["etag"] == '"1"'
+
+    # Now current: reused without parsing again
+    record = transcript_fetcher.transcript_record(response, "u", store.get("u"), store, "TEST", 0)
+    assert record["quarter"] == "new"
+    assert len(parsed) == 1
+
+def failing_listing(monkeypatch):
+    def fetch_page(*args, **kwargs):
+        raise TimeoutError("listing timed out")
+
+    monkeypatch.setattr(transcript_fetcher, "fetch_page", fetch_page)
+    monkeypatch.setattr(transcript_fetcher, "get_session", lambda: None)
+
+def test_listing_failure_serves_the_stored_transcripts(tmp_path, monkeypatch):
+    failing_listing(monkeypatch)
+    store = TranscriptStore(str(tmp_path / "transcripts.db"))
+    for quarter in ("Q1 2025", "Q3 2025", "Q2 2025"):
+        record = {"quarter": quarter, "date": "Unknown Date", "content": "", "turns": []}
+        store.save(quarter, b"page", record, symbol="NVDA", parser_version=transcript_fetcher.PARSER_VERSION)
+    store.save("other", b"page", {"quarter": "Q4 2025"}, symbol="AMD", parser_version=transcript_fetcher.PARSER_VERSION)
+
+    records = transcript_fetcher.fetch_transcripts(store, "NVDA")
+    assert [r["quarter"] for r in records] == ["Q3 2025", "Q2 2025", "Q1 2025"]
+
+def test_listing_failure_without_stored_transcripts(tmp_path, monkeypatch):
+    failing_listing(monkeypatch)
+    store = TranscriptStore(str(tmp_path / "transcripts.db"))
+
+    with pytest.raises(transcript_fetcher.TranscriptFetchError):
+        transcript_fetcher.fetch_transcripts(store, "NVDA")
+    # Placeholders only when the symbol was never analyzed
+    assert transcript_fetcher.fetch_transcripts(store, "NVDA", placeholder=True) == \
+        transcript_fetcher.get_hardcoded_transcripts("NVDA")
@@ -0,0 +1,202 @@
+import logging
+import os
+import re
+import zlib
+
+import numpy as np
+
+from local_sentiment import THEMES
+
+logger = logging.getLogger(__name__)
+
+# Cosine similarity at which a new theme joins an existing cluster instead of starting one
+SIMILARITY = float(os.getenv("THEME_SIMILARITY", "0.6"))
+# Size of the hashed character n-gram vectors
+DIMENSIONS = 1024
+NGRAM = 3
+# Words that describe what is happening to a focus rather than which focus it is, so
+# "Blackwell ramp", "Blackwell platform" and "Blackwell demand" all reduce to "blackwell"
+GENERIC_WORDS = set("""
+a adoption and buildout business demand expansion focus for growth in initiatives investment
+investments leadership market markets momentum of on opportunities opportunity platform platforms
+ramp revenue strategy strong the to transition
+""".split())
+SECTIONS = ("management", "qa")
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_QUARTER_RE = re.compile(r"Q([1-4])\s+(\d{4})")
+_SEED_PATTERNS = [(label, re.compile(rf"\b(?:{pattern})\b", re.IGNORECASE)) for label, pattern in THEMES]
+
+def normalize(theme):
+    return " ".join(_WORD_RE.findall(theme.lower()))
+
+def vectorize(themes):
+    """L2-normalized hashed character n-gram counts, one row per theme"""
+    vectors = np.zeros((len(themes), DIMENSIONS))
+    for row, theme in enumerate(themes):
+        words = normalize(theme).split()
+        # A theme made only of generic words is still compared on those words
+        words = [word for word in words if word not in GENERIC_WORDS] or words
+        for word in words:
+            padded = f" {word} "
+            for i in range(max(1, len(padded) - NGRAM + 1)):
+                vectors[row, zlib.crc32(padded[i:i + NGRAM].encode()) % DIMENSIONS] += 1
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def sentiment_score(result):
+    """Signed section sentiment: +confidence when positive, -confidence when negative, 0 when neutral"""
+    sign = {"positive": 1.0, "negative": -1.0}.get(result.get("sentiment"), 0.0)
+    return sign * float(result.get("confidence", 0.5))
+
+def quarter_key(quarter):
+    """Chronological sort key; quarters that are not "Q1 2025"-style sort last"""
+    match = _QUARTER_RE.search(quarter or "")
+    return (int(match.group(2)), int(match.group(1))) if match else (9999, 9, quarter or "")
+
+class ThemeIndex:
+    """Canonical themes across every analyzed quarter, grown incrementally.
+
+    Each free-text theme is mapped to a cluster of similar themes: a variant seen
+    before keeps its cluster, a new one joins the most similar cluster centroid or
+    starts its own. Clusters are seeded with the locally known focuses, whose labels
+    stay canonical and whose patterns claim any theme naming only that focus.
+    Quarters are kept after they drop out of the latest analysis, so trends reach
+    further back than the four quarters analyzed at a time.
+    """
+
+    def __init__(self, clusters=None, quarters=None):
+        # [{"label", "variants": {variant as first written: mentions in the indexed quarters}, "seeded"}]
+        self.clusters = clusters if clusters is not None else []
+        # Seeds for known focuses, including ones added since the index was stored
+        self._seeds = {cluster["label"]: i for i, cluster in enumerate(self.clusters) if cluster["seeded"]}
+        for label, _ in THEMES:
+            if label not in self._seeds:
+                self._seeds[label] = len(self.clusters)
+                self.clusters.append({"label": label, "variants": {label: 0}, "seeded": True})
+        # {quarter: {"date", "mentions": [[cluster, section, score, variant], ...]}}
+        # (indexes stored before variants were recorded have mentions without one)
+        self.quarters = quarters or {}
+        # Normalized variant -> (cluster, variant as stored)
+        self._aliases = {
+            normalize(variant): (i, variant) for i, cluster in enumerate(self.clusters) for variant in cluster["variants"]
+        }
+        self._centroids = np.vstack([self._centroid(cluster) for cluster in self.clusters])
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        return cls(data["clusters"], data["quarters"])
+
+    def to_dict(self):
+        return {"clusters": self.clusters, "quarters": self.quarters}
+
+    def _centroid(self, cluster):
+        centroid = vectorize(list(cluster["variants"])).sum(axis=0)
+        norm = np.linalg.norm(centroid)
+        return centroid / norm if norm else centroid
+
+    def assign(self, theme):
+        """(cluster index, variant as stored) for a theme, creating or extending clusters as needed.
+
+        Variant counts are left to add_analysis, which counts mentions per indexed quarter.
+        """
+        key = normalize(theme)
+        if key in self._aliases:
+            return self._aliases[key]
+
+        variant = theme.strip()
+        index = self._nearest(variant)
+        if index is not None:
+            self.clusters[index]["variants"][variant] = 0
+            self._centroids[index] = self._centroid(self.clusters[index])
+        else:
+            index = len(self.clusters)
+            self.clusters.append({"label": variant, "variants": {variant: 0}, "seeded": False})
+            self._centroids = np.vstack([self._centroids, self._centroid(self.clusters[index])])
+        self._aliases[key] = index, variant
+        return index, variant
+
+    def _count(self, mentions, step):
+        """Add step to the variant count of every mention that records its variant"""
+        for mention in mentions:
+            if len(mention) > 3:
+                cluster, variant = mention[0], mention[3]
+                self.clusters[cluster]["variants"][variant] += step
+
+    def _nearest(self, variant):
+        """The seed whose pattern alone matches, else the most similar cluster above SIMILARITY, else None"""
+        seeds = [label for label, pattern in _SEED_PATTERNS if pattern.search(variant)]
+        if len(seeds) == 1:
+            return self._seeds[seeds[0]]
+        similarities = self._centroids @ vectorize([variant])[0]
+        if similarities.max() >= SIMILARITY:
+            return int(similarities.argmax())
+        return None
+
+    def add_analysis(self, analysis):
+        """Index every quarter of an analysis, replacing earlier analyses of the same quarters.
+
+        A replaced quarter's mentions are taken off the variant counts first, so
+        re-indexing a quarter does not count its themes twice.
+        Returns how many quarters were new to the index.
+        """
+        added = 0
+        for result in analysis:
+            quarter = result.get("quarter", "Unknown Quarter")
+            if quarter in self.quarters:
+                self._count(self.quarters[quarter]["mentions"], -1)
+            else:
+                added += 1
+            mentions = []
+            for section in SECTIONS:
+                section_result = result.get(section) or {}
+                score = round(sentiment_score(section_result), 4)
+                # A theme listed twice in one section counts once; analyses stored before themes
+                # were validated may still hold non-string themes, which are skipped
+                themes = [theme for theme in section_result.get("themes") or [] if isinstance(theme, str) and normalize(theme)]
+                clusters = {}
+                for theme in themes:
+                    cluster, variant = self.assign(theme)
+                    clusters.setdefault(cluster, variant)
+                mentions.extend([cluster, section, score, variant] for cluster, variant in clusters.items())
+            self._count(mentions, 1)
+            self.quarters[quarter] = {"date": result.get("date"), "mentions": mentions}
+        if added:
+            logger.info(f"Indexed themes of {added} new quarter(s), {len(self.clusters)} theme clusters")
+        return added
+
+    def label(self, cluster):
+        """A seeded cluster keeps its label; others are named after their most frequent (then shortest) variant"""
+        if cluster["seeded"]:
+            return cluster["label"]
+        return max(cluster["variants"].items(), key=lambda item: (item[1], -len(item[0])))[0]
+
+    def series(self):
+        """Per-theme mention counts and mean signed sentiment per quarter, oldest quarter first"""
+        quarters = sorted(self.quarters, key=quarter_key)
+        counts = np.zeros((len(self.clusters), len(quarters)), dtype=int)
+        scores = np.zeros((len(self.clusters), len(quarters)))
+        for column, quarter in enumerate(quarters):
+            for cluster, _, score, *_ in self.quarters[quarter]["mentions"]:
+                counts[cluster, column] += 1
+                scores[cluster, column] += score
+        mean = np.divide(scores, counts, out=np.zeros_like(scores), where=counts > 0)
+
+        themes = []
+        for cluster in np.argsort(-counts.sum(axis=1), kind="stable"):
+            total = int(counts[cluster].sum())
+            if not total:
+                break
+            themes.append({
+                "theme": self.label(self.clusters[cluster]),
+                "variants": sorted(v for v, seen in self.clusters[cluster]["variants"].items() if seen),
+                "mentions": total,
+                "frequency": counts[cluster].tolist(),
+                "sentiment": [round(float(mean[cluster, c]), 3) if counts[cluster, c] else None for c in range(len(quarters))],
+            })
+        return {
+            "quarters": [{"quarter": quarter, "date": self.quarters[quarter]["date"]} for quarter in quarters],
+            "themes": themes,
+        }
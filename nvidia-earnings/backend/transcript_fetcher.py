@@ -1,9 +1,17 @@
-import requests
-from bs4 import BeautifulSoup
 import logging
+import os
 import re
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from urllib.parse import urlparse
+from rate_limiter import RateLimiter
+from resilience import Gate, backoff_delay, get_endpoint
+from metrics import CACHE_REQUESTS, HARDCODED_FALLBACKS, in_context, timed
+from segmentation import segment
+from transcript_store import TranscriptStore, content_hash, quarter_period
 
 # Configure logging
 logging.basicConfig(
@@ -12,162 +20,273 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://www.fool.com/earnings-call-transcripts/"
+SITE_ROOT = os.getenv("FOOL_SITE_ROOT", "https://www.fool.com").rstrip("/")
+BASE_URL = f"{SITE_ROOT}/earnings-call-transcripts/"
 
-def fetch_transcripts():
-    logger.info("Starting transcript fetch")
+# Maximum number of simultaneous page downloads per host
+FETCH_CONCURRENCY = max(1, int(os.getenv("FETCH_CONCURRENCY", "4")))
+# Politeness: requests started per minute per host, shared by every symbol being refreshed;
+# up to FETCH_CONCURRENCY of them may start at once, so a refresh still downloads pages concurrently
+FETCH_REQUESTS_PER_MINUTE = float(os.getenv("FETCH_REQUESTS_PER_MINUTE", "60"))
+# Retries of a page after a connection error, timeout, 429 or 5xx
+FETCH_MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "2"))
+# A page download slower than this percentile of recent ones gets a duplicate request (0 disables)
+FETCH_HEDGE_PERCENTILE = float(os.getenv("FETCH_HEDGE_PERCENTILE", "95"))
+
+DEFAULT_SYMBOL = "NVDA"
+# Bump whenever parsing or segmentation changes the records built from a page, so pages
+# already stored are re-parsed instead of reused; 2 added the speaker-turn index
+PARSER_VERSION = 2
+# Transcripts analyzed per symbol: the latest calls on the listing
+MAX_TRANSCRIPTS = 4
+# Names that identify a company in listing link text, besides its ticker
+COMPANY_NAMES = {"NVDA": "NVIDIA"}
+
+_host_gates = {}
+_host_gates_lock = threading.Lock()
+
+def _host_gate(url):
+    """Gate bounding concurrent and per-minute requests to the host of url"""
+    host = urlparse(url).netloc
+    with _host_gates_lock:
+        if host not in _host_gates:
+            _host_gates[host] = Gate(FETCH_CONCURRENCY, RateLimiter(FETCH_REQUESTS_PER_MINUTE, burst=FETCH_CONCURRENCY))
+        return _host_gates[host]
+
+def fetch_page(session, url, timeout=20, headers=None):
+    """Download a single page through its host's circuit breaker, retrying transient errors.
+
+    Every attempt, hedged duplicates included, respects the per-host concurrency and rate limits.
+    """
+    import requests
+
+    endpoint = get_endpoint(
+        urlparse(url).netloc, hedge_percentile=FETCH_HEDGE_PERCENTILE, gate=_host_gate(url), is_failure=is_transient
+    )
+
+    def attempt():
+        response = session.get(url, timeout=timeout, headers=headers)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    for retry in range(FETCH_MAX_RETRIES + 1):
+        try:
+            return endpoint.call(attempt)
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            if retry == FETCH_MAX_RETRIES or not is_transient(e) or endpoint.breaker.is_open():
+                raise
+            delay = backoff_delay(retry)
+            logger.warning(f"Fetching {url} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def is_transient(error):
+    """Connection errors, timeouts, 429s and 5xx are worth retrying and count against the host's circuit;
+    other HTTP errors (a removed page's 404) are not"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return True
+    return response.status_code == 429 or response.status_code >= 500
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """One session for every fetch, so connections to a host are pooled across refreshes"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update({
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+                "Accept-Language": "en-US,en;q=0.7",
+                "Referer": "https://www.fool.com/",
+                "Sec-Fetch-Dest": "document",
+                "Sec-Fetch-Mode": "navigate",
+                "Sec-Fetch-Site": "same-origin",
+            })
+            # Room for a full set of concurrent downloads per host plus their hedged duplicates
+            adapter = HTTPAdapter(pool_connections=FETCH_CONCURRENCY, pool_maxsize=2 * FETCH_CONCURRENCY)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+_store = None
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = TranscriptStore()
+    return _store
+
+def company_name(symbol):
+    return COMPANY_NAMES.get(symbol, symbol)
+
+class TranscriptFetchError(RuntimeError):
+    """The listing failed and no stored transcripts can stand in for it"""
+
+def fetch_transcripts(store=None, symbol=DEFAULT_SYMBOL, placeholder=False):
+    """The symbol's latest transcripts.
+
+    When the listing fails the symbol's stored transcripts stand in for it; without any,
+    TranscriptFetchError is raised, unless placeholder allows the hardcoded samples
+    (meant for symbols never analyzed, which have nothing better to show).
+    """
+    # Scraping dependencies load on the first fetch, so workers serving cached analyses start fast
+    from html_parsing import parse_listing_links
+
+    logger.info(f"Starting transcript fetch for {symbol}")
+    store = store or get_store()
     transcripts = []
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.7",
-        "Referer": "https://www.fool.com/",
-        "Sec-Fetch-Dest": "document",
-        "Sec-Fetch-Mode": "navigate",
-        "Sec-Fetch-Site": "same-origin",
-    })
+    session = get_session()
 
     try:
-        # Fetch main listing page for NVIDIA transcripts
-        nvidia_url = f"{BASE_URL}?symbol=NVDA"
-        logger.info(f"Fetching {nvidia_url}")
-        response = session.get(nvidia_url, timeout=15)
-        response.raise_for_status()
+        # Fetch main listing page for the symbol's transcripts
+        listing_url = f"{BASE_URL}?symbol={symbol}"
+        logger.info(f"Fetching {listing_url}")
+        with timed("listing_fetch"):
+            response = fetch_page(session, listing_url, timeout=15)
         
         # Check if we got redirected or got a different page
-        if "nvidia" not in response.text.lower():
-            logger.warning("Page doesn't contain NVIDIA content, may have been redirected")
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Improved transcript detection
-        cards = soup.select('article.card')
-        if not cards:
-            cards = soup.select('div.card')
+        keywords = {symbol.lower(), company_name(symbol).lower()}
+        if not any(keyword in response.text.lower() for keyword in keywords):
+            logger.warning(f"Page doesn't contain {symbol} content, may have been redirected")
         
+        # Card links first, then any transcript link naming the company
         urls = []
-        for card in cards[:8]:  # Get more cards to ensure we get 4 valid
-            link = card.select_one('a[href*="/earnings-call-transcripts/"]')
-            if not link:
-                link = card.select_one('a')
-                
-            if link:
-                href = link.get('href', '')
-                if href:
-                    full_url = f"https://www.fool.com{href}" if href.startswith('/') else href
-                    urls.append(full_url)
-                    logger.info(f"Found transcript: {full_url}")
-        
-        # If still no URLs, try alternative detection
-        if not urls:
-            logger.warning("Primary method failed, trying alternative detection")
-            for a in soup.find_all('a', href=True):
-                href = a['href']
-                text = a.get_text(' ', strip=True).lower()
-                if "/earnings-call-transcripts/" in href and "nvidia" in text:
-                    full_url = f"https://www.fool.com{href}" if href.startswith('/') else href
-                    urls.append(full_url)
-                    logger.info(f"Found via alt method: {full_url}")
+        for href in parse_listing_links(response.content, keywords=tuple(keywords)):
+            full_url = f"{SITE_ROOT}{href}" if href.startswith('/') else href
+            urls.append(full_url)
+            logger.info(f"Found transcript: {full_url}")
         
-        # Take only the first 4 URLs
-        urls = urls[:4]
+        # Take only the most recent calls
+        urls = urls[:MAX_TRANSCRIPTS]
         
         if not urls:
             logger.error("No transcript links found. Page structure may have changed.")
-            # Fallback to hardcoded recent transcripts
-            return get_hardcoded_transcripts()
+            return fallback_transcripts(store, symbol, placeholder)
         
-        # Process each transcript
-        for j, url in enumerate(urls):
-            logger.info(f"Processing transcript {j+1}: {url}")
-            response = session.get(url, timeout=20)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract title - try multiple selectors
-            title_el = (soup.select_one('h1.font-bold') or 
-                        soup.select_one('h1.title') or 
-                        soup.select_one('h1'))
-            title = title_el.get_text(strip=True) if title_el else "NVIDIA Earnings Call"
-            
-            # Extract date - multiple strategies
-            date_el = (soup.select_one("time") or 
-                       soup.select_one("span.text-tertiary-text") or 
-                       soup.select_one("span.date"))
-            date_text = "Unknown Date"
-            if date_el:
-                datetime_attr = date_el.get("datetime")
-                if datetime_attr:
-                    date_text = datetime_attr.split("T")[0]
-                else:
-                    date_text = date_el.get_text(strip=True)
-            
-            # Determine quarter
-            quarter = determine_quarter(title, url, date_text)
-            
-            # Extract content - multiple strategies
-            content_selectors = [
-                'div.article-content', 
-                'div.break-words', 
-                'div.article-body',
-                'article',
-                'div.content'
-            ]
-            article_el = None
-            for selector in content_selectors:
-                article_el = soup.select_one(selector)
-                if article_el:
-                    break
-                
-            paragraphs = article_el.find_all('p') if article_el else []
-            clean_paragraphs = []
-            for p in paragraphs:
-                text = p.get_text(strip=True)
-                if text and not any(x in text.lower() for x in ["motley fool", "copyright", "transcript"]):
-                    # Remove stock ticker noise
-                    if not re.match(r"^[A-Z]{1,5}\d*\.?\d*%?$", text):
-                        clean_paragraphs.append(text)
-            text = "\n".join(clean_paragraphs)
-            
-            # Split management discussion and Q&A
-            qa_index = -1
-            qa_patterns = [
-                r"question.{1,10}answer", 
-                r"q\s*&\s*a", 
-                r"operator",
-                r"q\.?\s*&\.?\s*a\.?",
-                r"questions?\s+and\s+answers?"
-            ]
-            for pattern in qa_patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    qa_index = match.start()
-                    break
-                    
-            if qa_index != -1:
-                management = text[:qa_index]
-                qa = text[qa_index:]
-            else:
-                management = text
-                qa = ""
-
-            transcripts.append({
-                "quarter": quarter,
-                "date": date_text,
-                "content": text,
-                "management": management,
-                "qa": qa,
-            })
+        # Known transcripts are revalidated with conditional GETs, new ones downloaded in full
+        stored = {url: store.get(url) for url in urls}
 
+        # Download transcript pages concurrently and parse each one as soon as it arrives
+        def fetch_transcript_page(url):
+            with timed("page_fetch"):
+                return fetch_page(session, url, headers=store.conditional_headers(stored[url]))
+
+        results = [None] * len(urls)
+        with ThreadPoolExecutor(max_workers=min(FETCH_CONCURRENCY, len(urls))) as executor:
+            futures = {
+                executor.submit(in_context(fetch_transcript_page), url): j
+                for j, url in enumerate(urls)
+            }
+            for future in as_completed(futures):
+                j = futures[future]
+                url = urls[j]
+                entry = stored[url]
+                try:
+                    results[j] = transcript_record(future.result(), url, entry, store, symbol, j)
+                except Exception as e:
+                    # One bad page costs only that transcript (or its last stored copy), not the others
+                    if entry:
+                        logger.warning(f"Transcript {j+1} failed ({e}), keeping the stored copy: {url}")
+                        results[j] = entry["record"]
+                    else:
+                        logger.warning(f"Transcript {j+1} failed ({e}), skipping it: {url}")
+
+        # Keep listing order regardless of download completion order
+        transcripts.extend(record for record in results if record is not None)
+        if not transcripts:
+            logger.error("Every transcript page failed.")
+            return fallback_transcripts(store, symbol, placeholder)
+
+    except TranscriptFetchError:
+        raise
     except Exception as e:
         logger.error(f"Error in fetch_transcripts: {str(e)}")
         logger.error(traceback.format_exc())
-        return get_hardcoded_transcripts()  # Fallback to hardcoded data
+        return fallback_transcripts(store, symbol, placeholder)
 
     logger.info(f"Successfully fetched {len(transcripts)} transcripts")
     return transcripts
 
+def transcript_record(response, url, entry, store, symbol, j):
+    """The record for a downloaded page: the stored one when unchanged, otherwise freshly parsed and saved"""
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+
+    if response.status_code == 304 and entry:
+        logger.info(f"Transcript {j+1} not modified: {url}")
+        CACHE_REQUESTS.inc(cache="transcript", result="hit")
+        store.touch(url, etag, last_modified, symbol)
+        return current_record(entry, store, symbol, etag=etag, last_modified=last_modified)
+
+    if entry and entry["content_hash"] == content_hash(response.content):
+        logger.info(f"Transcript {j+1} unchanged: {url}")
+        CACHE_REQUESTS.inc(cache="transcript", result="hit")
+        store.touch(url, etag, last_modified, symbol)
+        return current_record(entry, store, symbol, response.content, etag, last_modified)
+
+    CACHE_REQUESTS.inc(cache="transcript", result="miss")
+    logger.info(f"Processing transcript {j+1}: {url}")
+    record = parse_transcript_page(response.content, url)
+    store.save(url, response.content, record, etag, last_modified, symbol, PARSER_VERSION)
+    return record
+
+def fallback_transcripts(store, symbol, placeholder=False):
+    """The symbol's latest stored transcripts, else the hardcoded samples if placeholder allows"""
+    records = [current_record(entry, store, symbol) for entry in store.entries(symbol)]
+    if records:
+        records = sorted(records, key=lambda record: quarter_period(record.get("quarter")), reverse=True)[:MAX_TRANSCRIPTS]
+        logger.warning(f"Using {len(records)} stored {symbol} transcripts")
+        return records
+    if placeholder:
+        logger.warning(f"No stored {symbol} transcripts, using the hardcoded samples")
+        return get_hardcoded_transcripts(symbol)
+    raise TranscriptFetchError(f"Could not fetch {symbol} transcripts and none are stored")
+
+def current_record(entry, store, symbol=None, html=None, etag=None, last_modified=None):
+    """A stored entry's record, re-parsed from its page (html, or the stored copy) if an older parser built it"""
+    if entry.get("parser_version", 1) >= PARSER_VERSION:
+        return entry["record"]
+    url = entry["url"]
+    html = html if html is not None else store.html(url)
+    if html is None:
+        return entry["record"]
+    logger.info(f"Re-parsing {url}, stored by parser version {entry.get('parser_version', 1)}")
+    record = parse_transcript_page(html, url)
+    store.save(url, html, record, etag or entry.get("etag"), last_modified or entry.get("last_modified"), symbol, PARSER_VERSION)
+    return record
+
+def parse_transcript_page(html, url):
+    """Extract quarter, date, text and speaker-turn index from a transcript page"""
+    from html_parsing import parse_transcript_parts
+
+    return build_transcript_record(parse_transcript_parts(html), url)
+
+def build_transcript_record(parts, url):
+    """Turn the title, date and paragraphs extracted from a page into a transcript record"""
+    title = parts.title if parts.title is not None else "NVIDIA Earnings Call"
+    date_text = parts.date if parts.date is not None else "Unknown Date"
+    
+    # Determine quarter
+    quarter = determine_quarter(title, url, date_text)
+    
+    # One pass builds the text and its speaker-turn index; sections are views over the turns
+    with timed("qa_split"):
+        content, turns = segment(parts.paragraphs)
+
+    return {
+        "quarter": quarter,
+        "date": date_text,
+        "content": content,
+        "turns": turns,
+    }
+
 def determine_quarter(title, url, date_text):
     """Robust quarter detection with multiple strategies"""
     # Strategy 1: Extract from title
@@ -209,8 +328,12 @@ def determine_quarter(title, url, date_text):
     
     return "Unknown Quarter"
 
-def get_hardcoded_transcripts():
-    """Fallback function with all 4 quarters"""
+def get_hardcoded_transcripts(symbol=DEFAULT_SYMBOL):
+    """Fallback function with all 4 quarters (only NVIDIA has any)"""
+    HARDCODED_FALLBACKS.inc()
+    if symbol != DEFAULT_SYMBOL:
+        logger.warning(f"No fallback transcripts for {symbol}")
+        return []
     logger.warning("Using hardcoded fallback transcripts")
     return [
         {
@@ -243,5 +366,5 @@ def get_hardcoded_transcripts():
         }
     ]
 
-def get_transcripts():
-    return fetch_transcripts()
\ No newline at end of file
+def get_transcripts(symbol=DEFAULT_SYMBOL, placeholder=False):
+    return fetch_transcripts(symbol=symbol, placeholder=placeholder)
\ No newline at end of file
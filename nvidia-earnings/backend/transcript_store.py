@@ -0,0 +1,324 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.getenv("TRANSCRIPT_DB", "transcripts.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    html BLOB NOT NULL,
+    record TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    parser_version INTEGER NOT NULL DEFAULT 1,
+    symbol TEXT
+)
+"""
+# Columns added after the first release, added to older databases on open
+# (older pages get their symbol on their next save or revalidation)
+MIGRATIONS = {
+    "parser_version": "ALTER TABLE transcripts ADD COLUMN parser_version INTEGER NOT NULL DEFAULT 1",
+    "symbol": "ALTER TABLE transcripts ADD COLUMN symbol TEXT",
+}
+ENTRY_COLUMNS = "url, content_hash, record, etag, last_modified, fetched_at, parser_version"
+
+# One full-text row per speaker turn, with its metadata in a plain table under the same id,
+# so filtering and ordering by call never read the turn text. A transcript's turns sit at
+# ids transcript_rowid * TURN_SLOTS + turn, so reindexing a page deletes an id range
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS transcript_turns USING fts5(
+    text, speaker,
+    tokenize = 'porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS turn_index (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    symbol TEXT,
+    quarter TEXT,
+    period INTEGER NOT NULL,
+    date TEXT,
+    section TEXT,
+    role TEXT
+);
+"""
+TURN_SLOTS = 100000
+
+# Search result orders: best match first, or by call for "when was this first mentioned"
+SEARCH_ORDERS = {
+    "relevance": "bm25(transcript_turns)",
+    "oldest": "m.period, m.id",
+    "newest": "m.period DESC, m.id",
+}
+
+QUARTER_RE = re.compile(r"Q([1-4])\s+(\d{4})")
+TERM_RE = re.compile(r"\w+")
+# FTS5 operators and column filters ("speaker: Kress") are not words to highlight
+QUERY_SYNTAX_RE = re.compile(r"\b(?:AND|OR|NOT|NEAR)\b|\w+\s*:")
+SNIPPET_CHARS = 160
+
+def make_snippet(text, query, size=SNIPPET_CHARS):
+    """About size characters of text around the first query term, with matches in [brackets].
+
+    Built here rather than with FTS5's snippet(), which re-reads every match of the query.
+    Longer terms match by prefix, a rough stand-in for the index's Porter stemming.
+    """
+    terms = TERM_RE.findall(QUERY_SYNTAX_RE.sub(" ", query))
+    if not terms:
+        return text[:size]
+    pattern = re.compile(r"\b(?:%s)" % "|".join(
+        re.escape(term) + r"s?\b" if len(term) <= 4 else re.escape(term[:len(term) - 2]) + r"\w*"
+        for term in terms
+    ), re.IGNORECASE)
+
+    match = pattern.search(text)
+    start = max(0, match.start() - size // 4) if match else 0
+    if start:
+        # Start and end on word boundaries
+        start = text.find(" ", start) + 1 or start
+    end = min(len(text), start + size)
+    if end < len(text):
+        end = text.rfind(" ", start, end) if " " in text[start:end] else end
+    snippet = pattern.sub(lambda m: f"[{m.group(0)}]", text[start:end])
+    return ("…" if start else "") + snippet + ("…" if end < len(text) else "")
+
+def quarter_period(quarter):
+    """Sortable call period: 20251 for "Q1 2025", 0 when the quarter is unknown"""
+    match = QUARTER_RE.search(quarter or "")
+    return int(match.group(2)) * 10 + int(match.group(1)) if match else 0
+
+def content_hash(html):
+    """Stable hash of raw page bytes"""
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    return hashlib.sha256(html).hexdigest()
+
+class TranscriptStore:
+    """SQLite store of raw transcript pages, parsed records and HTTP validators.
+
+    Each record is stored with the version of the parser that built it, so callers
+    can re-parse the stored page when parsing has changed since.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(transcripts)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+            try:
+                conn.executescript(SEARCH_SCHEMA)
+                self.searchable = True
+            except sqlite3.OperationalError as e:
+                # SQLite builds without FTS5 still store transcripts, just not search them
+                logger.warning(f"Transcript search disabled: {e}")
+                self.searchable = False
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per operation keeps the store safe to use
+        # from request threads and fetch workers alike
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, url):
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {ENTRY_COLUMNS} FROM transcripts WHERE url = ?", (url,)).fetchone()
+        return self._entry(row) if row else None
+
+    def entries(self, symbol):
+        """Every stored page of a symbol, most recently fetched first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {ENTRY_COLUMNS} FROM transcripts WHERE symbol = ? ORDER BY fetched_at DESC", (symbol,)
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    @staticmethod
+    def _entry(row):
+        return {
+            "url": row[0],
+            "content_hash": row[1],
+            "record": json.loads(row[2]),
+            "etag": row[3],
+            "last_modified": row[4],
+            "fetched_at": row[5],
+            "parser_version": row[6],
+        }
+
+    def html(self, url):
+        """The stored raw page, or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT html FROM transcripts WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def conditional_headers(self, entry):
+        """If-None-Match / If-Modified-Since headers for a stored entry"""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def save(self, url, html, record, etag=None, last_modified=None, symbol=None, parser_version=1):
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO transcripts (url, content_hash, html, record, etag, last_modified, fetched_at, parser_version, symbol)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    html = excluded.html,
+                    record = excluded.record,
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    fetched_at = excluded.fetched_at,
+                    parser_version = excluded.parser_version,
+                    symbol = COALESCE(excluded.symbol, symbol)
+                """,
+                (url, content_hash(html), html, json.dumps(record), etag, last_modified, time.time(), parser_version, symbol)
+            )
+            self._index(conn, url, record, symbol)
+        logger.info(f"Stored transcript {url}")
+
+    def touch(self, url, etag=None, last_modified=None, symbol=None):
+        """Record a successful revalidation, keeping any newer validators"""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE transcripts SET
+                    etag = COALESCE(?, etag),
+                    last_modified = COALESCE(?, last_modified),
+                    fetched_at = ?,
+                    symbol = COALESCE(?, symbol)
+                WHERE url = ?
+                """,
+                (etag, last_modified, time.time(), symbol, url)
+            )
+            # Pages stored before the search index existed are indexed on their next revalidation
+            if symbol is not None and not self._indexed(conn, url):
+                row = conn.execute("SELECT record FROM transcripts WHERE url = ?", (url,)).fetchone()
+                if row:
+                    self._index(conn, url, json.loads(row[0]), symbol)
+
+    def _rowids(self, conn, url):
+        """First and last rowid reserved for the turns of a stored page"""
+        rowid = conn.execute("SELECT rowid FROM transcripts WHERE url = ?", (url,)).fetchone()[0]
+        return rowid * TURN_SLOTS, (rowid + 1) * TURN_SLOTS - 1
+
+    def _indexed(self, conn, url):
+        if not self.searchable:
+            return True
+        first, last = self._rowids(conn, url)
+        return conn.execute(
+            "SELECT 1 FROM turn_index WHERE id BETWEEN ? AND ? LIMIT 1", (first, last)
+        ).fetchone() is not None
+
+    def _index(self, conn, url, record, symbol):
+        """Replace the page's rows in the search index with one row per speaker turn"""
+        if not self.searchable:
+            return
+        first, last = self._rowids(conn, url)
+        conn.execute("DELETE FROM transcript_turns WHERE rowid BETWEEN ? AND ?", (first, last))
+        conn.execute("DELETE FROM turn_index WHERE id BETWEEN ? AND ?", (first, last))
+
+        quarter = record.get("quarter", "Unknown Quarter")
+        period = quarter_period(quarter)
+        content = record.get("content", "")
+        if "turns" in record:
+            turns = [
+                (content[t["start"]:t["end"]], t["speaker"], t["section"], t["role"])
+                for t in record["turns"]
+            ]
+        else:
+            # Records from before the turn index carry whole sections as plain strings
+            turns = [(record[section], None, section, None) for section in ("management", "qa") if record.get(section)]
+
+        turns = list(enumerate(turns[:TURN_SLOTS], start=first))
+        conn.executemany(
+            "INSERT INTO transcript_turns (rowid, text, speaker) VALUES (?, ?, ?)",
+            [(turn_id, text, speaker or "") for turn_id, (text, speaker, _, _) in turns]
+        )
+        conn.executemany(
+            """
+            INSERT INTO turn_index (id, url, symbol, quarter, period, date, section, role)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [(turn_id, url, symbol, quarter, period, record.get("date"), section, role) for turn_id, (_, _, section, role) in turns]
+        )
+
+    def search(self, query, symbol=None, section=None, order="relevance", limit=20):
+        """Speaker turns matching an FTS5 query ("sovereign AI" in quotes is a phrase), best first.
+
+        Queries that are not valid FTS5 syntax are retried as a plain AND of their words.
+        """
+        if not self.searchable:
+            raise RuntimeError("Transcript search needs SQLite with FTS5")
+        with self._connect() as conn:
+            try:
+                return self._search(conn, query, symbol, section, order, limit)
+            except sqlite3.OperationalError:
+                terms = " ".join(f'"{term}"' for term in TERM_RE.findall(query))
+                return self._search(conn, terms, symbol, section, order, limit) if terms else []
+
+    def _search(self, conn, query, symbol, section, order, limit):
+        # Rank and filter on the index alone, then fetch text and metadata for the returned turns only
+        ranked = conn.execute(
+            f"""
+            SELECT t.rowid, {"bm25(transcript_turns)" if order == "relevance" else "NULL"}
+            FROM transcript_turns t JOIN turn_index m ON m.id = t.rowid
+            WHERE transcript_turns MATCH ?
+              AND (? IS NULL OR m.symbol = ?) AND (? IS NULL OR m.section = ?)
+            ORDER BY {SEARCH_ORDERS[order]}
+            LIMIT ?
+            """,
+            (query, symbol, symbol, section, section, limit)
+        ).fetchall()
+        if not ranked:
+            return []
+        ids = [turn_id for turn_id, _ in ranked]
+        placeholders = ",".join("?" * len(ids))
+        texts = {
+            row[0]: row[1:]
+            for row in conn.execute(f"SELECT rowid, text, speaker FROM transcript_turns WHERE rowid IN ({placeholders})", ids)
+        }
+        turns = {
+            row[0]: row[1:]
+            for row in conn.execute(
+                f"SELECT id, quarter, date, symbol, role, section, url FROM turn_index WHERE id IN ({placeholders})", ids
+            )
+        }
+        hits = []
+        for turn_id, score in ranked:
+            quarter, date, symbol, role, section, url = turns[turn_id]
+            text, speaker = texts[turn_id]
+            hits.append({
+                "quarter": quarter,
+                "date": date,
+                "symbol": symbol,
+                "speaker": speaker or None,
+                "role": role,
+                "section": section,
+                "url": url,
+                "snippet": make_snippet(text, query),
+                # Higher is better; only relevance-ordered searches are scored
+                "score": round(-score, 3) if score is not None else None,
+            })
+        return hits
@@ -4,11 +4,12 @@ import ToneChangeChart from './ToneChangeChart';
 import QuarterSelector from './QuarterSelector';
 import StrategicFocus from './StrategicFocus';
 import TranscriptViewer from './TranscriptViewer';
-import { fetchAnalysis } from '../services/api';
+import { fetchAnalysis, fetchThemes, streamAnalysis } from '../services/api';
 
 const Dashboard = () => {
   const [data, setData] = useState([]);
   const [selectedQuarter, setSelectedQuarter] = useState(null);
+  const [themeTrends, setThemeTrends] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -16,13 +17,33 @@ const Dashboard = () => {
     const getAnalysisData = async () => {
       try {
         setLoading(true);
-        const analysisData = await fetchAnalysis();
+        // Render quarters progressively as the backend finishes them
+        const analysisData = await streamAnalysis({
+          onQuarter: (index, quarter) => {
+            setData((previous) => {
+              const next = [...previous];
+              next[index] = quarter;
+              return next;
+            });
+            setSelectedQuarter((current) => current || quarter);
+            setLoading(false);
+          },
+        }).catch((err) => {
+          console.warn('Streaming unavailable, falling back to full fetch:', err);
+          return fetchAnalysis();
+        });
         if (!Array.isArray(analysisData) || analysisData.length === 0) {
           throw new Error('No data returned from API.');
         }
         setData(analysisData);
-        setSelectedQuarter(analysisData[0]);
+        setSelectedQuarter((current) =>
+          analysisData.find((quarter) => quarter && current && quarter.quarter === current.quarter) || analysisData[0]
+        );
         setError(null);
+        // Trends are built alongside the analysis, so they are ready once it is; the panel works without them
+        fetchThemes()
+          .then(setThemeTrends)
+          .catch((err) => console.warn('Theme trends unavailable:', err));
       } catch (err) {
         console.error('Fetch error:', err);
         setError('Failed to load analysis data. Please try again later.');
@@ -60,23 +81,26 @@ const Dashboard = () => {
     );
   }
 
+  // Quarters can arrive out of order while streaming; render the ones that are ready
+  const quarters = data.filter(Boolean);
+
   return (
     <div className="space-y-10">
       <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
         <div className="bg-white p-6 rounded-lg shadow-lg">
           <h2 className="text-xl font-bold text-blue-800 mb-4">📈 Sentiment Analysis</h2>
-          <SentimentChart data={data} />
+          <SentimentChart data={quarters} />
         </div>
 
         <div className="bg-white p-6 rounded-lg shadow-lg">
           <h2 className="text-xl font-bold text-blue-800 mb-4">📊 Tone Change Quarter-over-Quarter</h2>
-          <ToneChangeChart data={data} />
+          <ToneChangeChart data={quarters} />
         </div>
       </div>
 
       <div className="bg-white p-6 rounded-lg shadow-md">
         <QuarterSelector
-          quarters={data}
+          quarters={quarters}
           selected={selectedQuarter}
           onSelect={setSelectedQuarter}
         />
@@ -85,7 +109,7 @@ const Dashboard = () => {
       {selectedQuarter && (
         <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
           <div className="bg-white p-6 rounded-lg shadow-md">
-            <StrategicFocus quarter={selectedQuarter} />
+            <StrategicFocus quarter={selectedQuarter} trends={themeTrends} />
           </div>
 
           <div className="bg-white p-6 rounded-lg shadow-md">
@@ -20,7 +20,60 @@ const getThemeIcon = (theme) => {
   return <FaChevronRight className="text-blue-500 mr-2 flex-shrink-0" />;
 };
 
-const StrategicFocus = ({ quarter }) => {
+// Themes shown in the trend table
+const MAX_TRENDS = 5;
+
+const trendCellClass = (sentiment) => {
+  if (sentiment === null) return 'bg-gray-100 text-gray-400';
+  if (sentiment > 0.2) return 'bg-green-100 text-green-700';
+  if (sentiment < -0.2) return 'bg-red-100 text-red-700';
+  return 'bg-blue-100 text-blue-700';
+};
+
+// Mentions per quarter of the most discussed canonical themes, shaded by their sentiment
+const ThemeTrends = ({ trends, selected }) => {
+  if (!trends || !trends.themes || trends.themes.length === 0) return null;
+
+  return (
+    <div className="mt-4 pt-3 border-t border-blue-100">
+      <h4 className="text-sm font-semibold text-blue-800 mb-2">Theme Trends</h4>
+      <table className="w-full text-xs">
+        <thead>
+          <tr>
+            <th className="text-left font-normal text-gray-500 pb-1">Theme</th>
+            {trends.quarters.map(({ quarter }) => (
+              <th
+                key={quarter}
+                className={`font-normal pb-1 ${quarter === selected ? 'text-blue-800 font-semibold' : 'text-gray-500'}`}
+              >
+                {quarter}
+              </th>
+            ))}
+          </tr>
+        </thead>
+        <tbody>
+          {trends.themes.slice(0, MAX_TRENDS).map((trend) => (
+            <tr key={trend.theme} title={trend.variants.join(', ')}>
+              <td className="text-gray-700 py-1 pr-2">{trend.theme}</td>
+              {trend.frequency.map((count, index) => (
+                <td key={trends.quarters[index].quarter} className="py-1 px-0.5">
+                  <div
+                    className={`text-center rounded ${trendCellClass(trend.sentiment[index])}`}
+                    title={trend.sentiment[index] === null ? 'Not mentioned' : `Sentiment ${trend.sentiment[index].toFixed(2)}`}
+                  >
+                    {count || '–'}
+                  </div>
+                </td>
+              ))}
+            </tr>
+          ))}
+        </tbody>
+      </table>
+    </div>
+  );
+};
+
+const StrategicFocus = ({ quarter, trends }) => {
   if (!quarter.management.themes || quarter.management.themes.length === 0) {
     return (
       <div className="bg-gradient-to-br from-blue-50 to-indigo-50 p-5 rounded-xl shadow-sm border border-blue-100">
@@ -28,6 +81,7 @@ const StrategicFocus = ({ quarter }) => {
           Strategic Focus Areas
         </h3>
         <p className="text-gray-500 italic">No strategic focus areas identified for this quarter</p>
+        <ThemeTrends trends={trends} selected={quarter.quarter} />
       </div>
     );
   }
@@ -62,6 +116,8 @@ const StrategicFocus = ({ quarter }) => {
           </motion.li>
         ))}
       </ul>
+
+      <ThemeTrends trends={trends} selected={quarter.quarter} />
       
       <div className="mt-4 pt-3 border-t border-blue-100">
         <p className="text-xs text-gray-500 flex items-center">
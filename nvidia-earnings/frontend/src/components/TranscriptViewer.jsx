@@ -1,13 +1,62 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { FaChevronDown, FaChevronUp, FaQuoteLeft, FaComments, FaChartBar } from 'react-icons/fa';
 import { motion, AnimatePresence } from 'framer-motion';
+import { fetchTranscript } from '../services/api';
 
-const TranscriptViewer = ({ transcript }) => {
+// The transcript text is loaded on demand: a preview first, the rest when asked for
+const PREVIEW_BYTES = 16384;
+
+const TranscriptViewer = ({ transcript, symbol }) => {
   const [activeTab, setActiveTab] = useState('management');
   const [expandedSections, setExpandedSections] = useState({
     management: false,
     qa: false
   });
+  const [fullText, setFullText] = useState({ text: '', loaded: 0, total: 0, loading: false, error: false });
+  // One decoder per transcript so a character split across two ranges still decodes
+  const decoder = useRef(null);
+  const activeQuarter = useRef(null);
+
+  const quarterName = transcript?.quarter;
+  const inlineContent = transcript?.content;
+
+  useEffect(() => {
+    if (!quarterName || inlineContent) return undefined;
+    let cancelled = false;
+    activeQuarter.current = quarterName;
+    decoder.current = new TextDecoder();
+    setFullText({ text: '', loaded: 0, total: 0, loading: true, error: false });
+    fetchTranscript(quarterName, { symbol, length: PREVIEW_BYTES })
+      .then(({ bytes, total }) => {
+        if (cancelled) return;
+        const text = decoder.current.decode(bytes, { stream: bytes.length < total });
+        setFullText({ text, loaded: bytes.length, total, loading: false, error: false });
+      })
+      .catch((err) => {
+        console.error('Transcript fetch error:', err);
+        if (!cancelled) setFullText((prev) => ({ ...prev, loading: false, error: true }));
+      });
+    return () => { cancelled = true; };
+  }, [quarterName, inlineContent, symbol]);
+
+  const loadRest = async () => {
+    const requested = quarterName;
+    setFullText((prev) => ({ ...prev, loading: true }));
+    try {
+      const { bytes, total } = await fetchTranscript(requested, { symbol, start: fullText.loaded });
+      if (requested !== activeQuarter.current) return;
+      setFullText((prev) => ({
+        text: prev.text + decoder.current.decode(bytes),
+        loaded: prev.loaded + bytes.length,
+        total,
+        loading: false,
+        error: false
+      }));
+    } catch (err) {
+      console.error('Transcript fetch error:', err);
+      setFullText((prev) => ({ ...prev, loading: false, error: true }));
+    }
+  };
 
   // Ensure transcript has the expected structure
   const management = transcript?.management || {
@@ -197,7 +246,20 @@ const TranscriptViewer = ({ transcript }) => {
       <div className="mt-6 pt-4 border-t border-gray-200">
         <h4 className="font-medium text-gray-700 mb-2">Full Transcript:</h4>
         <div className="bg-white p-4 rounded-lg border border-gray-200 shadow-sm max-h-60 overflow-y-auto">
-          <p className="text-gray-700 whitespace-pre-wrap">{transcript?.content || 'No full transcript available'}</p>
+          <p className="text-gray-700 whitespace-pre-wrap">
+            {inlineContent || fullText.text || (fullText.loading ? 'Loading transcript...' : 'No full transcript available')}
+          </p>
+          {!inlineContent && fullText.loaded < fullText.total && (
+            <button
+              onClick={loadRest}
+              disabled={fullText.loading}
+              className="text-blue-500 flex items-center text-sm mt-3"
+            >
+              <FaChevronDown className="mr-1" />
+              {fullText.loading ? 'Loading...' : 'Load full transcript'}
+            </button>
+          )}
+          {fullText.error && <p className="text-red-600 text-sm mt-2">Could not load the transcript.</p>}
         </div>
       </div>
     </div>
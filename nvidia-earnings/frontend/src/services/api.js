@@ -2,9 +2,16 @@ import axios from 'axios';
 
 const API_BASE = process.env.REACT_APP_API_BASE || 'http://localhost:8000';
 
-export const fetchAnalysis = async () => {
+// Without a symbol the backend's default ticker (NVDA) is used
+const analysisPath = (symbol) =>
+  symbol ? `/api/analysis/${encodeURIComponent(symbol)}` : '/api/analysis';
+
+// Results carry sentiment, themes and tone change only; pass fields (e.g. ['quarter', 'content'])
+// to choose them, or use fetchTranscript for a quarter's text
+export const fetchAnalysis = async (symbol, fields) => {
   try {
-    const response = await axios.get(`${API_BASE}/api/analysis`);
+    const params = fields ? { fields: fields.join(',') } : undefined;
+    const response = await axios.get(`${API_BASE}${analysisPath(symbol)}`, { params });
     return response.data;
   } catch (error) {
     // Helpful debugging info in console
@@ -16,3 +23,79 @@ export const fetchAnalysis = async () => {
     throw new Error('Failed to fetch analysis data');
   }
 };
+
+// Canonical themes across every analyzed quarter, precomputed by the backend:
+// { quarters: [{ quarter, date }], themes: [{ theme, variants, mentions, frequency, sentiment }] }
+// where frequency and sentiment (-1..1, null when unmentioned) line up with quarters, oldest first
+export const fetchThemes = async (symbol) => {
+  const path = symbol ? `/api/themes/${encodeURIComponent(symbol)}` : '/api/themes';
+  const response = await axios.get(`${API_BASE}${path}`);
+  return response.data;
+};
+
+// Fetches a quarter's transcript text, or `length` bytes of it from byte offset `start`.
+// Resolves to { bytes, total } where total is the size of the whole transcript in bytes.
+export const fetchTranscript = async (quarter, { symbol, start = 0, length } = {}) => {
+  const quarterPath = symbol
+    ? `${analysisPath(symbol)}/${encodeURIComponent(quarter)}`
+    : `/api/analysis/${encodeURIComponent(quarter)}`;
+  const headers = {};
+  if (length) {
+    headers.Range = `bytes=${start}-${start + length - 1}`;
+  } else if (start) {
+    headers.Range = `bytes=${start}-`;
+  }
+
+  const response = await fetch(`${API_BASE}${quarterPath}/transcript`, { headers });
+  if (!response.ok) {
+    throw new Error('Failed to fetch transcript');
+  }
+  const bytes = new Uint8Array(await response.arrayBuffer());
+  // "bytes 0-16383/51234" on partial responses; a full response is the whole transcript
+  const contentRange = response.headers.get('Content-Range');
+  const total = contentRange ? Number(contentRange.split('/')[1]) : start + bytes.length;
+  return { bytes, total };
+};
+
+// Streams /api/analysis/stream (NDJSON) and reports each quarter as soon as it is analyzed.
+// onQuarter(index, quarter) fires per quarter; the resolved value is the complete list,
+// with tone_change filled in from the final "done" event.
+export const streamAnalysis = async ({ symbol, onStart, onQuarter, onDone } = {}) => {
+  const response = await fetch(`${API_BASE}${analysisPath(symbol)}/stream`);
+  if (!response.ok || !response.body) {
+    throw new Error('Failed to stream analysis data');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  const quarters = [];
+  let buffer = '';
+
+  const handleEvent = (event) => {
+    if (event.type === 'start') {
+      onStart?.(event.total);
+    } else if (event.type === 'quarter') {
+      quarters[event.index] = event.data;
+      onQuarter?.(event.index, event.data);
+    } else if (event.type === 'done') {
+      event.tone_changes.forEach(({ index, tone_change }) => {
+        if (quarters[index]) quarters[index] = { ...quarters[index], tone_change };
+      });
+      onDone?.(quarters);
+    } else if (event.type === 'error') {
+      throw new Error(event.message || 'Analysis failed');
+    }
+  };
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.filter((line) => line.trim()).forEach((line) => handleEvent(JSON.parse(line)));
+  }
+  if (buffer.trim()) handleEvent(JSON.parse(buffer));
+
+  return quarters;
+};